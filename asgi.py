@@ -0,0 +1,5 @@
+from fuze import app, db
+from fuze.app import configure
+from fuze.asgi import AsyncApp
+
+application = AsyncApp(configure(app, db))
@@ -0,0 +1,48 @@
+import time
+
+from fuze import app, db
+from fuze.app import configure
+
+configure(app, db)
+
+
+def setup(uri="sqlite:///"):
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_ECHO"] = False
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+
+    context = app.app_context()
+    context.push()
+
+    db.drop_all()
+    db.create_all()
+    return app.test_client()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100.0 * len(samples))))
+    return samples[index]
+
+
+def summarize(samples, elapsed=None):
+    if elapsed is None:
+        elapsed = sum(samples)
+    if not samples:
+        return {"count": 0, "rps": 0.0}
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
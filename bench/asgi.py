@@ -0,0 +1,130 @@
+"""Compares the sync gunicorn server with the ASGI app under concurrency.
+
+A file database is seeded with meetings, viewers and password protected
+recordings, then the read endpoints (GET /meeting and GET /view) are hit
+against gunicorn (run:app) and uvicorn (asgi:application) at each
+concurrency level.  Latency percentiles and requests/sec are printed as
+JSON.
+
+    python -m bench.asgi --concurrency 1 16 64 256 --output bench_asgi.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from bench.story import PASSWORD, Gunicorn, basic, run_phase
+
+
+class Uvicorn(Gunicorn):
+    name = "uvicorn"
+
+    def command(self):
+        return [
+            sys.executable, "-m", "uvicorn",
+            "--host", "127.0.0.1",
+            "--port", str(self.port),
+            "--workers", str(self.workers),
+            "--log-level", "warning",
+            "--no-access-log",
+            "asgi:application",
+        ]
+
+
+def seed(target, args):
+    users = ["user{}@planetexpress.com".format(i) for i in range(args.viewers)]
+    target.request("POST", "/users:batch", json.dumps({"emails": users}))
+
+    meetings = []
+    for i in range(args.meetings):
+        status, data = target.request("POST", "/meeting", json.dumps({
+            "host": users[i % len(users)], "password": PASSWORD
+        }))
+        meeting_id = json.loads(data.decode("utf-8"))["meeting_id"]
+        target.request("PUT", "/meeting/viewers:batch", json.dumps({
+            "meeting_id": meeting_id, "emails": users
+        }))
+        meetings.append(meeting_id)
+    return users, meetings
+
+
+def scenario(target, args):
+    users, meetings = seed(target, args)
+    results = {}
+    for concurrency in args.concurrency:
+        requests = args.requests
+        run_phase(target, "GET /meeting?meeting_id=<id> c={}".format(
+            concurrency
+        ), [
+            ("GET", "/meeting", None,
+             {"meeting_id": meetings[i % len(meetings)]}, None, 200)
+            for i in range(requests)
+        ], concurrency, results)
+
+        run_phase(target, "GET /meeting?limit=50 c={}".format(concurrency), [
+            ("GET", "/meeting", None,
+             {"meeting_id": "all", "limit": 50}, None, 200)
+            for _ in range(requests)
+        ], concurrency, results)
+
+        run_phase(target, "GET /view c={}".format(concurrency), [
+            ("GET", "/view", None, {"meeting_id": meetings[i % len(meetings)]},
+             basic(users[i % len(users)]), 302)
+            for i in range(requests)
+        ], concurrency, results)
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target", choices=["gunicorn", "uvicorn", "both"], default="both"
+    )
+    parser.add_argument("--meetings", type=int, default=100)
+    parser.add_argument("--viewers", type=int, default=20,
+                        help="viewers per recording")
+    parser.add_argument("--requests", type=int, default=1000,
+                        help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 16, 64, 256])
+    parser.add_argument("--workers", type=int, default=1,
+                        help="server worker processes")
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    targets = {"gunicorn": Gunicorn, "uvicorn": Uvicorn}
+    names = sorted(targets) if args.target == "both" else [args.target]
+
+    report = {
+        "params": {
+            "meetings": args.meetings,
+            "viewers": args.viewers,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+        },
+        "targets": {},
+    }
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmp:
+            uri = "sqlite:///" + os.path.join(tmp, "bench.db")
+            target = targets[name](uri, args.workers)
+            target.start()
+            try:
+                report["targets"][name] = scenario(target, args)
+            finally:
+                target.stop()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""CPU spent against bytes saved when compressing GET /meeting listings.
+
+Encodes one listing with every offered encoding at a few levels and reports
+compression time, output size and ratio, then serves the listing and the
+streamed listing through the test client per Accept-Encoding.
+
+    python -m bench.compression [meetings] [viewers]
+"""
+import json
+import sys
+import timeit
+import uuid
+
+from bench import app, measure, setup
+from bench.serialization import populate
+from fuze import compression
+from fuze.models import meeting_document
+from fuze.serialization import dumps
+
+LEVELS = {"gzip": [1, 6, 9], "deflate": [1, 6, 9], "br": [1, 4, 11]}
+
+
+# random viewer addresses so the ratio isn't flattered by repetition
+def payload(meetings, viewers):
+    return {
+        "results": [
+            meeting_document(i, "host@foo.com", i, [
+                "{}@foo.com".format(uuid.uuid4().hex[:12])
+                for _ in range(viewers)
+            ])
+            for i in range(1, meetings + 1)
+        ],
+        "next_cursor": None,
+    }
+
+
+def main(meetings, viewers):
+    client = setup()
+    data = dumps(payload(meetings, viewers))
+
+    encode = {}
+    for encoding in compression.encodings():
+        for level in LEVELS[encoding]:
+            config = {
+                "COMPRESS_LEVEL": level, "COMPRESS_BROTLI_QUALITY": level
+            }
+            func = lambda: compression.compress(encoding, data, config)
+            size = len(func())
+            encode["{} {}".format(encoding, level)] = {
+                "ms": min(timeit.repeat(func, number=3, repeat=3)) / 3 * 1000,
+                "bytes": size,
+                "ratio": len(data) / size,
+            }
+
+    populate(meetings, viewers)
+    app.config["SLOW_REQUEST_MS"] = None
+    served = {}
+    for encoding in ["identity"] + compression.encodings():
+        for stream in ("false", "true"):
+            headers = {"Accept-Encoding": encoding}
+            query = {"meeting_id": "all", "stream": stream}
+            size = len(client.get("/meeting", query_string=query,
+                                  headers=headers).data)
+            label = "{} stream".format(encoding) if stream == "true" \
+                else encoding
+            served[label] = measure(lambda: client.get(
+                "/meeting", query_string=query, headers=headers
+            ).data, 10)
+            served[label]["bytes"] = size
+
+    print(json.dumps({
+        "params": {
+            "meetings": meetings,
+            "viewers": viewers,
+            "bytes": len(data),
+        },
+        "encode": encode,
+        "GET /meeting": served,
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if sys.argv[1:] else 200,
+        int(sys.argv[2]) if sys.argv[2:] else 50,
+    )
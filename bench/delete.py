@@ -0,0 +1,85 @@
+"""DELETE /meeting and DELETE /user on recordings with many viewers.
+
+    python -m bench.delete [sizes...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from bench import app, db, setup
+from fuze.models import Meeting, Recording, User, Viewer
+
+SIZES = [1000, 10000, 100000]
+HOST = "host@foo.com"
+
+
+def populate(size):
+    emails = ["viewer{}@foo.com".format(i) for i in range(size)]
+    db.session.execute(User.__table__.insert(), [
+        {"email": email} for email in emails + [HOST]
+    ])
+    db.session.execute(Recording.__table__.insert(), [
+        {"id": 1, "url": "test", "owner_email": HOST}
+    ])
+    db.session.execute(Meeting.__table__.insert(), [
+        {"id": 1, "host_email": HOST, "recording_id": 1}
+    ])
+    db.session.execute(Viewer.__table__.insert(), [
+        {"viewer": email, "recording_id": 1} for email in emails
+    ])
+    db.session.commit()
+    db.session.remove()
+
+
+def timed(client, method, path, body):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    try:
+        status = client.open(
+            path, method=method, data=json.dumps(body)
+        ).status_code
+    except Exception:
+        status = 500
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", count)
+    return {
+        "ms": elapsed * 1000,
+        "statements": len(statements),
+        "status": status,
+    }
+
+
+def main(sizes):
+    app.config["SLOW_REQUEST_MS"] = None
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = setup("sqlite:///" + os.path.join(tmp, "bench.db"))
+            populate(size)
+            meeting = timed(client, "DELETE", "/meeting", {"meeting_id": 1})
+            db.session.remove()
+            db.engine.dispose()
+
+            client = setup("sqlite:///" + os.path.join(tmp, "bench2.db"))
+            populate(size)
+            user = timed(client, "DELETE", "/user", {"email": HOST})
+            db.session.remove()
+            db.engine.dispose()
+
+        results[size] = {"DELETE /meeting": meeting, "DELETE /user": user}
+
+    print(json.dumps({"delete": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,52 @@
+"""Password verification throughput as the hashing pool grows.
+
+    python -m bench.hash_pool [clients]
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import app
+from fuze import errors
+from fuze.passwords import pbkdf2, pool
+
+
+def main(clients):
+    iterations = app.config["PASSWORD_PBKDF2_ITERATIONS"]
+    results = {}
+    for kind in ("thread", "process"):
+        for workers in (1, 2, 4, 8):
+            app.config["PASSWORD_POOL"] = kind
+            app.config["PASSWORD_POOL_WORKERS"] = workers
+            app.config["PASSWORD_POOL_QUEUE"] = clients
+            pool.configure()
+            pool.run(pbkdf2, "secret", b"salt", 1)
+
+            rejected = [0]
+
+            def verify(_):
+                try:
+                    pool.run(pbkdf2, "secret", b"salt", iterations)
+                except errors.HashingBusy:
+                    rejected[0] += 1
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(clients) as executor:
+                list(executor.map(verify, range(clients * 4)))
+            elapsed = time.perf_counter() - start
+
+            results["{} x{}".format(kind, workers)] = {
+                "hashes_per_second": (clients * 4 - rejected[0]) / elapsed,
+                "rejected": rejected[0],
+            }
+
+    print(json.dumps({
+        "cpus": os.cpu_count(), "clients": clients, "iterations": iterations,
+        "hash_pool": results,
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if sys.argv[1:] else 16)
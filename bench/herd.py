@@ -0,0 +1,112 @@
+"""A thundering herd on one meeting: many clients at once reading
+GET /meeting?meeting_id=1 and /view, with request coalescing on and off.
+
+    python -m bench.herd [--clients 50] [--requests 20] [--viewers 1000]
+"""
+import argparse
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from bench import app, db, setup, summarize
+from fuze.cache import meeting_reads
+from fuze.models import User, Viewer
+
+HOST = "host@foo.com"
+
+
+def populate(client, viewers):
+    client.post("/user", data=json.dumps({"email": HOST}))
+    client.post(
+        "/meeting", data=json.dumps({"host": HOST, "password": "secret"})
+    )
+    emails = ["viewer{}@foo.com".format(i) for i in range(viewers)]
+    db.session.execute(User.__table__.insert(), [
+        {"email": email} for email in emails
+    ])
+    db.session.execute(Viewer.__table__.insert(), [
+        {"viewer": email, "recording_id": 1} for email in emails
+    ])
+    db.session.commit()
+    db.session.remove()
+
+
+def herd(clients, requests):
+    auth = base64.b64encode(
+        "{}:secret".format(HOST).encode("utf-8")
+    ).decode("ascii")
+    calls = [
+        ("/meeting", {}),
+        ("/view", {"Authorization": "Basic {}".format(auth)}),
+    ] * (clients * requests // 2)
+    local = threading.local()
+    samples = {"/meeting": [], "/view": []}
+
+    def call(args):
+        path, headers = args
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        resp = client.get(
+            path, query_string={"meeting_id": 1}, headers=headers
+        )
+        resp.data
+        samples[path].append(time.perf_counter() - start)
+        assert resp.status_code in (200, 302), resp.status_code
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    meeting_reads.clear()
+    event.listen(db.engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(call, calls))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "statements": len(statements),
+        "requests": len(calls),
+        "reads": meeting_reads.stats(),
+        "/meeting": summarize(samples["/meeting"], elapsed),
+        "/view": summarize(samples["/view"], elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    app.config["SLOW_REQUEST_MS"] = None
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        client = setup("sqlite:///" + os.path.join(tmp, "bench.db"))
+        populate(client, args.viewers)
+        for coalesce in (False, True):
+            app.config["MEETING_COALESCE"] = coalesce
+            results["coalesced" if coalesce else "direct"] = herd(
+                args.clients, args.requests
+            )
+        db.session.remove()
+        db.engine.dispose()
+
+    print(json.dumps({"herd": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""POST /meeting throughput against a file backed SQLite database.
+
+    python -m bench.meeting_create [requests]
+"""
+import json
+import os
+import sys
+import tempfile
+
+from bench import measure, setup
+
+HOST = "host@foo.com"
+
+
+def main(repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        client = setup("sqlite:///" + os.path.join(tmp, "bench.db"))
+        client.post("/user", data=json.dumps({"email": HOST}))
+
+        def create():
+            resp = client.post(
+                "/meeting",
+                data=json.dumps({"host": HOST, "password": "secret"})
+            )
+            assert resp.status_code == 200, resp.status_code
+
+        results = measure(create, repeat)
+
+    print(json.dumps({"meeting_create": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if sys.argv[1:] else 500)
@@ -0,0 +1,57 @@
+"""/view latency with the configured password KDF, with and without the
+verified-credential and authorization caches.
+
+    python -m bench.passwords [hasher]
+"""
+import base64
+import json
+import sys
+
+from bench import app, db, measure, setup
+from fuze.cache import authorizations
+from fuze.passwords import credentials
+
+HOST = "host@foo.com"
+
+
+def main(hasher):
+    app.config["PASSWORD_HASHER"] = hasher
+    client = setup()
+    client.post("/user", data=json.dumps({"email": HOST}))
+    resp = client.post(
+        "/meeting", data=json.dumps({"host": HOST, "password": "secret"})
+    )
+    meeting_id = json.loads(resp.data.decode("utf-8"))["meeting_id"]
+    db.session.remove()
+
+    auth = base64.b64encode(
+        "{}:secret".format(HOST).encode("utf-8")
+    ).decode("ascii")
+    headers = {"Authorization": "Basic {}".format(auth)}
+
+    def view():
+        resp = client.get(
+            "/view", query_string={"meeting_id": meeting_id}, headers=headers
+        )
+        assert resp.status_code == 302, resp.status_code
+
+    sizes = (authorizations.size, credentials.size)
+    results = {}
+    for label, auth_size, cred_size in [
+        ("no cache", 0, 0),
+        ("credential cache", 0, sizes[1]),
+        ("credential and authorization cache", sizes[0], sizes[1]),
+    ]:
+        authorizations.clear()
+        credentials.clear()
+        authorizations.size, credentials.size = auth_size, cred_size
+        results[label] = measure(view, 50)
+    authorizations.size, credentials.size = sizes
+
+    print(json.dumps(
+        {"view": {hasher: results}}, indent=2, sort_keys=True
+    ))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if sys.argv[1:] else "pbkdf2_sha256")
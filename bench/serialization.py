@@ -0,0 +1,100 @@
+"""JSON encoding cost of large GET /meeting listings per backend.
+
+Times the Flask jsonify the app used before (sorted, pretty printed) against
+every backend in fuze.serialization on the same payload, then serves the
+listing through the test client with each backend, with and without
+MEETING_SUMMARY.
+
+    python -m bench.serialization [meetings] [viewers]
+"""
+import json
+import sys
+import timeit
+
+from flask import jsonify
+from bench import app, db, measure, setup
+from fuze.models import (
+    Meeting, MeetingSummary, Recording, User, Viewer, meeting_document
+)
+from fuze.serialization import backends
+
+
+def payload(meetings, viewers):
+    emails = ["viewer{}@foo.com".format(i) for i in range(viewers)]
+    return {
+        "results": [
+            meeting_document(i, "host@foo.com", i, emails)
+            for i in range(1, meetings + 1)
+        ],
+        "next_cursor": None,
+    }
+
+
+def populate(meetings, viewers):
+    emails = ["viewer{}@foo.com".format(i) for i in range(viewers)]
+    db.session.execute(User.__table__.insert(), [
+        {"email": email} for email in emails + ["host@foo.com"]
+    ])
+    db.session.execute(Recording.__table__.insert(), [
+        {"id": i, "url": "test", "owner_email": "host@foo.com"}
+        for i in range(1, meetings + 1)
+    ])
+    db.session.execute(Meeting.__table__.insert(), [
+        {"id": i, "host_email": "host@foo.com", "recording_id": i}
+        for i in range(1, meetings + 1)
+    ])
+    db.session.execute(Viewer.__table__.insert(), [
+        {"viewer": email, "recording_id": i}
+        for i in range(1, meetings + 1) for email in emails
+    ])
+    db.session.commit()
+    db.session.remove()
+
+
+def main(meetings, viewers):
+    client = setup()
+    body = payload(meetings, viewers)
+
+    encoders = {"jsonify": lambda: jsonify(body).get_data()}
+    for name, dumps in backends.items():
+        encoders[name] = lambda dumps=dumps: dumps(body)
+
+    encode = {}
+    with app.test_request_context():
+        for name, func in sorted(encoders.items()):
+            number = 5
+            encode[name] = {
+                "ms": min(timeit.repeat(func, number=number, repeat=3))
+                / number * 1000,
+                "bytes": len(func()),
+            }
+
+    populate(meetings, viewers)
+    app.config["SLOW_REQUEST_MS"] = None
+    served = {}
+    for name in sorted(backends):
+        app.config["JSON_BACKEND"] = name
+        for summary in (False, True):
+            app.config["MEETING_SUMMARY"] = summary
+            if summary:
+                MeetingSummary.rebuild()
+                db.session.commit()
+            label = "{} summary".format(name) if summary else name
+            served[label] = measure(lambda: client.get(
+                "/meeting", query_string={"meeting_id": "all"}
+            ), 10)
+    app.config["JSON_BACKEND"] = None
+    app.config["MEETING_SUMMARY"] = False
+
+    print(json.dumps({
+        "params": {"meetings": meetings, "viewers": viewers},
+        "encode": encode,
+        "GET /meeting": served,
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if sys.argv[1:] else 1000,
+        int(sys.argv[2]) if sys.argv[2:] else 50,
+    )
@@ -0,0 +1,289 @@
+"""Replays the story.py scenario and reports per endpoint latency.
+
+Users are created, meetings are created and shared, listed, viewed and
+finally deleted.  Every phase runs with the given concurrency either
+in-process through the Flask test client or over HTTP against a locally
+spawned gunicorn, and the results are printed as JSON so runs can be
+diffed across versions.
+
+    python -m bench.story --target both --users 200 --meetings 50 \\
+        --viewers 20 --concurrency 8 --output bench_output.json
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from bench import app, setup, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "nibbler"
+
+
+class InProcess(object):
+    name = "inprocess"
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.local = threading.local()
+
+    def start(self):
+        setup(self.uri)
+
+    def stop(self):
+        pass
+
+    def request(self, method, path, body=None, query=None, headers=None):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = app.test_client()
+        resp = client.open(
+            path, method=method, data=body, query_string=query,
+            headers=headers
+        )
+        return resp.status_code, resp.data
+
+
+class Gunicorn(object):
+    name = "gunicorn"
+
+    def __init__(self, uri, workers):
+        self.uri = uri
+        self.workers = workers
+        self.local = threading.local()
+        self.process = None
+
+    def start(self):
+        setup(self.uri)
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+
+        settings = os.path.join(os.path.dirname(self.uri[10:]), "settings.py")
+        with open(settings, "w") as f:
+            f.write("SQLALCHEMY_DATABASE_URI = {!r}\n".format(self.uri))
+            f.write("SQLALCHEMY_ECHO = False\n")
+            f.write("DEBUG = False\n")
+            f.write("SECRET_KEY = {!r}\n".format(os.urandom(16).hex()))
+
+        env = dict(os.environ, FUZE_SETTINGS=settings)
+        self.process = subprocess.Popen(self.command(), cwd=ROOT, env=env)
+
+        deadline = time.time() + 30
+        while time.time() < deadline and self.process.poll() is None:
+            try:
+                if self.request("GET", "/health")[0] == 200:
+                    return
+            except (OSError, http.client.HTTPException):
+                self.local = threading.local()
+                time.sleep(0.1)
+        raise RuntimeError("{} did not come up".format(self.name))
+
+    def command(self):
+        return [
+            sys.executable, "-m", "gunicorn.app.wsgiapp",
+            "-b", "127.0.0.1:{}".format(self.port),
+            "-w", str(self.workers),
+            "--log-level", "warning",
+            "run:app",
+        ]
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+    def request(self, method, path, body=None, query=None, headers=None):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(
+                "127.0.0.1", self.port
+            )
+        if query:
+            path = "{}?{}".format(path, urlencode(query))
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (OSError, http.client.HTTPException):
+            self.local.conn = None
+            conn.close()
+            raise
+
+
+def basic(username):
+    auth = base64.b64encode(
+        "{}:{}".format(username, PASSWORD).encode("utf-8")
+    ).decode("ascii")
+    return {"Authorization": "Basic {}".format(auth)}
+
+
+def run_phase(target, label, calls, concurrency, results):
+    samples = []
+    responses = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def call(args):
+        method, path, body, query, headers, expected = args
+        start = time.perf_counter()
+        try:
+            status, data = target.request(method, path, body, query, headers)
+        except (OSError, http.client.HTTPException):
+            status, data = None, b""
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append(elapsed)
+            if status != expected:
+                errors[0] += 1
+        return data
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        responses = list(pool.map(call, calls))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(samples, elapsed)
+    summary["errors"] = errors[0]
+    results[label] = summary
+    return responses
+
+
+def scenario(target, args):
+    results = {}
+    users = [
+        "user{}@planetexpress.com".format(i) for i in range(args.users)
+    ]
+    json_body = json.dumps
+
+    run_phase(target, "POST /user", [
+        ("POST", "/user", json_body({"email": email}), None, None, 200)
+        for email in users
+    ], args.concurrency, results)
+
+    run_phase(target, "POST /user (conflict)", [
+        ("POST", "/user", json_body({"email": email}), None, None, 409)
+        for email in users[:max(1, len(users) // 10)]
+    ], args.concurrency, results)
+
+    hosts = [users[i % len(users)] for i in range(args.meetings)]
+    responses = run_phase(target, "POST /meeting", [
+        ("POST", "/meeting", json_body({
+            "host": host, "password": PASSWORD
+        }), None, None, 200)
+        for host in hosts
+    ], args.concurrency, results)
+    meetings = [json.loads(data.decode("utf-8"))["meeting_id"]
+                for data in responses if data]
+
+    viewers = {
+        mid: [users[(i + j + 1) % len(users)] for j in range(args.viewers)]
+        for i, mid in enumerate(meetings)
+    }
+    run_phase(target, "PUT /meeting", [
+        ("PUT", "/meeting", json_body({
+            "meeting_id": mid, "email": email
+        }), None, None, 200)
+        for mid, emails in viewers.items() for email in emails
+    ], args.concurrency, results)
+
+    run_phase(target, "GET /meeting?meeting_id=all", [
+        ("GET", "/meeting", None, {"meeting_id": "all"}, None, 200)
+        for _ in range(args.repeat)
+    ], args.concurrency, results)
+
+    run_phase(target, "GET /meeting?meeting_id=<id>", [
+        ("GET", "/meeting", None, {"meeting_id": mid}, None, 200)
+        for mid in meetings for _ in range(args.repeat // len(meetings) + 1)
+    ], args.concurrency, results)
+
+    run_phase(target, "GET /view", [
+        ("GET", "/view", None, {"meeting_id": mid}, basic(email), 302)
+        for mid, emails in viewers.items() for email in emails
+        for _ in range(2)
+    ], args.concurrency, results)
+
+    run_phase(target, "GET /view (denied)", [
+        ("GET", "/view", None, {"meeting_id": mid},
+         basic("nobody@planetexpress.com"), 401)
+        for mid in meetings
+    ], args.concurrency, results)
+
+    run_phase(target, "DELETE /meeting", [
+        ("DELETE", "/meeting", json_body({
+            "meeting_id": mid, "password": PASSWORD
+        }), None, None, 200)
+        for mid in meetings
+    ], args.concurrency, results)
+
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target", choices=["inprocess", "gunicorn", "both"],
+        default="inprocess"
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--meetings", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=10,
+                        help="viewers per recording")
+    parser.add_argument("--repeat", type=int, default=100,
+                        help="requests for each read endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4,
+                        help="gunicorn worker processes")
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    targets = ["inprocess", "gunicorn"] if args.target == "both" \
+        else [args.target]
+
+    report = {
+        "params": {
+            "users": args.users,
+            "meetings": args.meetings,
+            "viewers": args.viewers,
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+        },
+        "targets": {},
+    }
+    for name in targets:
+        with tempfile.TemporaryDirectory() as tmp:
+            uri = "sqlite:///" + os.path.join(tmp, "bench.db")
+            if name == "gunicorn":
+                target = Gunicorn(uri, args.workers)
+            else:
+                target = InProcess(uri)
+
+            target.start()
+            try:
+                report["targets"][name] = scenario(target, args)
+            finally:
+                target.stop()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Per-request payload validation cost for every schema in fuze.scheme.
+
+    python -m bench.validation [repeat]
+"""
+import json
+import sys
+import timeit
+
+from jsonschema import validate
+from fuze.scheme import mapping
+from fuze.validation import validators
+
+PAYLOADS = {
+    "user_create": {"email": "a@foo.com"},
+    "user_delete": {"email": "a@foo.com"},
+    "users_batch_create": {
+        "emails": ["{}@foo.com".format(i) for i in range(100)]
+    },
+    "meeting_create": {"host": "a@foo.com", "password": "secret"},
+    "meeting_delete": {"meeting_id": 1, "password": "secret"},
+    "meeting_share": {"meeting_id": 1, "email": "a@foo.com"},
+    "meeting_share_batch": {
+        "meeting_id": 1, "emails": ["{}@foo.com".format(i) for i in range(100)]
+    },
+    "meeting_get": {"meeting_id": "all"},
+    "recording_visibility": {"recording_id": 1, "visibility": "public"},
+}
+
+
+def main(repeat):
+    results = {}
+    for name, schema in sorted(mapping.items()):
+        payload = PAYLOADS[name]
+        validator = validators[name]
+        timings = {
+            "validate": lambda: validate(payload, schema),
+            "compiled": lambda: validator.validator.validate(payload),
+            "fast": lambda: validator(payload),
+        }
+        results[name] = {
+            label: min(timeit.repeat(func, number=repeat, repeat=3))
+            / repeat * 1e6
+            for label, func in timings.items()
+        }
+        results[name]["speedup"] = (
+            results[name]["validate"] / results[name]["fast"]
+        )
+
+    print(json.dumps({"validation_us": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if sys.argv[1:] else 2000)
@@ -0,0 +1,81 @@
+"""/view latency as the number of viewers on a recording grows, with Basic
+credentials and with a bearer token from POST /view/token.
+
+    python -m bench.view [sizes...]
+"""
+import base64
+import json
+import sys
+
+from bench import db, measure, setup
+from fuze.cache import authorizations, meeting_reads
+from fuze.passwords import credentials
+from fuze.models import User, Viewer
+
+SIZES = [10, 1000, 10000, 100000]
+HOST = "host@foo.com"
+
+
+def populate(client, size):
+    db.drop_all()
+    db.create_all()
+
+    client.post("/user", data=json.dumps({"email": HOST}))
+    resp = client.post(
+        "/meeting", data=json.dumps({"host": HOST, "password": "secret"})
+    )
+    meeting_id = json.loads(resp.data.decode("utf-8"))["meeting_id"]
+
+    emails = ["viewer{}@foo.com".format(i) for i in range(size)]
+    db.session.execute(User.__table__.insert(), [
+        {"email": email} for email in emails
+    ])
+    db.session.execute(Viewer.__table__.insert(), [
+        {"viewer": email, "recording_id": 1} for email in emails
+    ])
+    db.session.commit()
+    db.session.remove()
+    return meeting_id, emails[-1]
+
+
+def main(sizes):
+    client = setup()
+    results = {}
+    for size in sizes:
+        meeting_id, viewer = populate(client, size)
+        auth = base64.b64encode(
+            "{}:secret".format(viewer).encode("utf-8")
+        ).decode("ascii")
+        basic = {"Authorization": "Basic {}".format(auth)}
+        resp = client.post(
+            "/view/token", query_string={"meeting_id": meeting_id},
+            headers=basic
+        )
+        token = json.loads(resp.data.decode("utf-8"))["token"]
+        bearer = {"Authorization": "Bearer {}".format(token)}
+
+        def view(headers):
+            resp = client.get(
+                "/view", query_string={"meeting_id": meeting_id},
+                headers=headers
+            )
+            assert resp.status_code == 302, resp.status_code
+
+        def cold(headers):
+            # as a worker sees it after a change or for the first time
+            for cache in (authorizations, meeting_reads, credentials):
+                cache.clear()
+            view(headers)
+
+        results[size] = {
+            "basic": measure(lambda: view(basic), 200),
+            "basic_cold": measure(lambda: cold(basic), 50),
+            "bearer": measure(lambda: view(bearer), 200),
+            "bearer_cold": measure(lambda: cold(bearer), 50),
+        }
+
+    print(json.dumps({"view": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or SIZES)
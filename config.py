@@ -1,8 +1,120 @@
 # prod config file
 
+import os
+
 DEBUG = True
 
 # Alchemy config
 SQLALCHEMY_DATABASE_URI = "sqlite:///../fuze.db"
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SQLALCHEMY_ECHO = True
+SQLALCHEMY_ECHO = False
+
+# response encoder, "orjson", "json" or None for orjson when installed
+JSON_BACKEND = None
+
+# gzip/deflate (and brotli when installed) for responses of these types,
+# bodies under COMPRESS_MIN_SIZE bytes are sent as is. Streamed bodies are
+# compressed on the fly and flushed every COMPRESS_STREAM_FLUSH input bytes
+COMPRESS = True
+COMPRESS_MIMETYPES = ["application/json"]
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+COMPRESS_STREAM_FLUSH = 64 * 1024
+
+# signs /download links, set the same value on every worker in FUZE_SETTINGS.
+# None gives each process its own random key, the app refuses to start that
+# way under gunicorn or uvicorn with more than one worker
+SECRET_KEY = None
+DOWNLOAD_URL_TTL = 300
+
+# lifetime of the bearer tokens from POST /view/token, also signed with
+# SECRET_KEY. Revocation is per worker, tokens run out after this at worst
+VIEW_TOKEN_TTL = 300
+
+# SQLite tuning, "default" only turns on foreign keys. "sqlite-prod" runs
+# the file in WAL mode with the pragmas below and keeps a connection pool
+# per worker so readers don't block behind writers
+SQLITE_MODE = "sqlite-prod"
+SQLITE_PROD_PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -64000),
+    ("mmap_size", 268435456),
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+]
+SQLITE_POOL_SIZE = 5
+SQLITE_MAX_OVERFLOW = 10
+
+# Read replicas, bind names from SQLALCHEMY_BINDS that GET /meeting reads
+# from, streamed listings included. Authorization always reads the
+# primary. A client that wrote reads from the primary for the next
+# REPLICA_STICKY_SECONDS. SQLite replicas are copies of the primary file,
+# see `python -m fuze.replicas sync --interval 1`
+READ_REPLICAS = []
+REPLICA_STICKY_SECONDS = 5
+
+# Meeting listing
+MEETING_PAGE_MAX = 1000
+MEETING_STREAM_BATCH = 500
+
+# GET /meeting reads ready made documents from meeting_summary, kept current
+# on every commit. Run `python -m fuze.summary rebuild` before turning it on
+# for an existing database
+MEETING_SUMMARY = False
+
+# Concurrent GET /meeting?meeting_id=N and /view reads of the same meeting
+# in one worker share a single database fetch, its result is reused for
+# MEETING_COALESCE_TTL seconds or until the worker's next write commits
+MEETING_COALESCE = True
+MEETING_COALESCE_SIZE = 1024
+MEETING_COALESCE_TTL = 0.5
+
+# /view authorization decisions, per worker process and keyed on the
+# meeting's version, so a change committed by any worker retires them
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL = 30
+
+# Requests slower than this are logged with their slowest statements,
+# None turns the log off. Every response carries a Server-Timing header
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_STATEMENTS = 5
+
+# /metrics, each worker writes its numbers here at most every
+# METRICS_FLUSH_INTERVAL seconds and a scrape merges all workers. Give
+# every server its own directory, gunicorn.conf.py empties it when the
+# master starts. None keeps the numbers per process
+METRICS_DIR = os.environ.get("FUZE_METRICS_DIR")
+METRICS_FLUSH_INTERVAL = 1.0
+
+# /health/ready, the database probe gives up after READINESS_TIMEOUT
+# seconds and its result is reused for READINESS_CACHE_SECONDS
+READINESS_TIMEOUT = 0.5
+READINESS_CACHE_SECONDS = 2
+
+# Recording passwords, hashes made with other settings are upgraded the
+# next time their password is checked. Successful checks are remembered
+# for PASSWORD_CACHE_TTL seconds so repeat views skip the KDF
+PASSWORD_HASHER = "pbkdf2_sha256"
+PASSWORD_PBKDF2_ITERATIONS = 200000
+PASSWORD_SCRYPT_N = 2 ** 14
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_CACHE_SIZE = 10000
+PASSWORD_CACHE_TTL = 300
+
+# KDF calls run on a "thread" or "process" pool (None hashes inline). When
+# PASSWORD_POOL_WORKERS are busy and PASSWORD_POOL_QUEUE more are waiting
+# requests get a 503 with Retry-After instead of queueing
+PASSWORD_POOL = "thread"
+PASSWORD_POOL_WORKERS = 4
+PASSWORD_POOL_QUEUE = 16
+
+# asgi.py, the async read routes share ASGI_DB_POOL_SIZE aiosqlite
+# connections and every other route runs the flask app on
+# ASGI_WSGI_THREADS threads. The async routes honour MEETING_SUMMARY but
+# skip MEETING_COALESCE, READ_REPLICAS, COMPRESS*, SLOW_REQUEST_* and
+# metrics, see fuze/asgi.py
+ASGI_DB_POOL_SIZE = 10
+ASGI_WSGI_THREADS = 8
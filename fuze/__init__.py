@@ -1,7 +1,48 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.selectable import SelectBase
+
+
+# plain SELECTs go to the replica bind named in session.info["replica"],
+# see fuze/replicas.py. The first write or flush pins the session to the
+# primary for the rest of the request so it reads what it just wrote
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = self.info.get("replica")
+        if replica is not None:
+            if isinstance(clause, SelectBase) and not self._flushing:
+                return get_state(self.app).db.get_engine(
+                    self.app, bind=replica
+                )
+            self.info["replica"] = None
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class FuzeSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        in_memory = info.database in (None, "", ":memory:")
+        super(FuzeSQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+        # flask-sqlalchemy opens a new connection per checkout for file
+        # backed sqlite, in prod mode keep a pool per worker instead so the
+        # pragmas, page cache and mmap survive between requests
+        prod = app.config.get("SQLITE_MODE") == "sqlite-prod"
+        if info.drivername == "sqlite" and prod and not in_memory:
+            options["poolclass"] = QueuePool
+            options["pool_size"] = app.config.get("SQLITE_POOL_SIZE", 5)
+            options["max_overflow"] = app.config.get("SQLITE_MAX_OVERFLOW", 10)
+            options.setdefault("connect_args", {})["check_same_thread"] = False
+
 
 app = Flask(__name__)
 app.config.from_object("config")
+app.config.from_envvar("FUZE_SETTINGS", silent=True)
 
-db = SQLAlchemy(app)
+db = FuzeSQLAlchemy(app)
@@ -1,5 +1,7 @@
-from flask import Response, jsonify
-from fuze import views
+from flask import Response
+from fuze import compression, metrics, replicas, timing, views
+from fuze.serialization import dumps
+from fuze.signing import check_secret_key
 from functools import wraps
 
 
@@ -7,7 +9,7 @@ class JsonResponse(Response):
     @classmethod
     def force_type(cls, rv, environ=None):
         if isinstance(rv, dict):
-            rv = jsonify(rv)
+            return cls(dumps(rv), mimetype="application/json")
         return super(JsonResponse, cls).force_type(rv, environ)
 
 
@@ -17,17 +19,39 @@ def get_http_exception_handler(app):
     @wraps(handle_http_exception)
     def ret_val(exception):
         exc = handle_http_exception(exception)
-        return jsonify({
+        metrics.error(exc)
+        response = app.response_class(dumps({
             'code': exc.code,
             'message': exc.description
-        }), exc.code
+        }), mimetype="application/json")
+        for key, value in exc.get_headers():
+            if key.lower() != "content-type":
+                response.headers[key] = value
+        return response, exc.code
 
     return ret_val
 
 
 def configure(app, db):
+    check_secret_key(app.config)
     app.response_class = JsonResponse
 
+    # registered first so its after_request runs last, after the commit
+    timing.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
+    replicas.init_app(app)
+
+    # one transaction per request, models only add/flush and the whole
+    # unit of work is committed here or thrown away on an error response
+    @app.after_request
+    def commit_session(response):
+        if response.status_code < 400:
+            db.session.commit()
+        else:
+            db.session.rollback()
+        return response
+
     @app.teardown_appcontext
     def shutdown_session(exception=None):
         db.session.remove()
@@ -38,6 +62,15 @@ def configure(app, db):
     app.add_url_rule(
         "/health", view_func=views.health, methods=["GET"]
     )
+    app.add_url_rule(
+        "/health/live", view_func=views.health_live, methods=["GET"]
+    )
+    app.add_url_rule(
+        "/health/ready", view_func=views.health_ready, methods=["GET"]
+    )
+    app.add_url_rule(
+        "/metrics", view_func=views.metrics, methods=["GET"]
+    )
 
     # User related routes
     app.add_url_rule(
@@ -46,6 +79,9 @@ def configure(app, db):
     app.add_url_rule(
         "/user", view_func=views.user_delete, methods=["DELETE"]
     )
+    app.add_url_rule(
+        "/users:batch", view_func=views.users_batch_create, methods=["POST"]
+    )
 
     # Meeting related routes
     app.add_url_rule(
@@ -60,10 +96,18 @@ def configure(app, db):
     app.add_url_rule(
         "/meeting", view_func=views.meeting_get, methods=["GET"]
     )
+    app.add_url_rule(
+        "/meeting/viewers:batch",
+        view_func=views.meeting_share_batch,
+        methods=["PUT"]
+    )
 
     app.add_url_rule(
         "/view", view_func=views.meeting_view, methods=["GET"]
     )
+    app.add_url_rule(
+        "/view/token", view_func=views.meeting_view_token, methods=["POST"]
+    )
 
     app.add_url_rule(
         "/recording", view_func=views.recording_visibility, methods=["PUT"]
@@ -0,0 +1,546 @@
+import asyncio
+import base64
+import binascii
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qsl
+
+import aiosqlite
+from sqlalchemy import and_, bindparam, exists, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine.url import make_url
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags, quote_etag
+from fuze import errors
+from fuze.cache import authorizations
+from fuze.models import (
+    Meeting, MeetingSummary, Recording, Version, Viewer, meeting_document,
+    sqlite_pragmas
+)
+from fuze.passwords import verify_password
+from fuze.serialization import dumps
+from fuze.signing import (
+    bearer_token, download_headers, download_url, verify_download,
+    verify_view_token
+)
+from fuze.views import (
+    listing_etag, meeting_etag, page_limit, parse_meeting_id, positive_int,
+    summary_page
+)
+
+
+meeting = Meeting.__table__
+recording = Recording.__table__
+viewer = Viewer.__table__
+version = Version.__table__
+summary = MeetingSummary.__table__
+
+
+# statements are built from the same tables as the models and compiled
+# once for sqlite, aiosqlite then runs them with positional parameters
+class Statement(object):
+
+    def __init__(self, stmt):
+        compiled = stmt.compile(dialect=sqlite.dialect())
+        self.sql = str(compiled)
+        self.names = compiled.positiontup
+        self.defaults = compiled.params
+
+    def params(self, values):
+        return [
+            values[name] if name in values else self.defaults[name]
+            for name in self.names
+        ]
+
+
+MEETINGS = Statement(
+    select([meeting.c.id, meeting.c.host_email, meeting.c.recording_id])
+    .where(meeting.c.id > bindparam("after"))
+    .order_by(meeting.c.id)
+    .limit(bindparam("limit"))
+)
+
+MEETING = Statement(
+    select([
+        meeting.c.id, meeting.c.host_email, meeting.c.recording_id,
+        meeting.c.version,
+    ])
+    .where(meeting.c.id == bindparam("id"))
+)
+
+MEETING_VERSION = Statement(
+    select([meeting.c.version]).where(meeting.c.id == bindparam("id"))
+)
+
+VERSION = Statement(
+    select([version.c.value]).where(version.c.name == bindparam("name"))
+)
+
+SUMMARY = Statement(
+    select([meeting.c.version, summary.c.document])
+    .select_from(meeting.join(summary, summary.c.meeting_id == meeting.c.id))
+    .where(meeting.c.id == bindparam("id"))
+)
+
+SUMMARIES = Statement(
+    select([summary.c.meeting_id, summary.c.document])
+    .where(summary.c.meeting_id > bindparam("after"))
+    .order_by(summary.c.meeting_id)
+    .limit(bindparam("limit"))
+)
+
+VIEWERS = Statement(
+    select([viewer.c.recording_id, viewer.c.viewer])
+    .select_from(
+        viewer.join(meeting, meeting.c.recording_id == viewer.c.recording_id)
+    )
+    .where(and_(
+        meeting.c.id >= bindparam("first"), meeting.c.id <= bindparam("last")
+    ))
+    .order_by(viewer.c.recording_id, viewer.c.viewer)
+)
+
+RECORDING = Statement(
+    select([
+        recording.c.id, recording.c.url, recording.c.owner_email,
+        recording.c.public, recording.c.pwhash, meeting.c.version,
+    ])
+    .select_from(
+        recording.join(meeting, meeting.c.recording_id == recording.c.id)
+    )
+    .where(meeting.c.id == bindparam("id"))
+)
+
+VIEWER_EXISTS = Statement(
+    select([exists().where(and_(
+        viewer.c.recording_id == bindparam("rid"),
+        viewer.c.viewer == bindparam("email"),
+    ))])
+)
+
+
+class Database(object):
+
+    def __init__(self, app):
+        self.app = app
+        self.size = app.config.get("ASGI_DB_POOL_SIZE", 10)
+        self.created = 0
+        self.idle = None
+
+    def path(self):
+        url = make_url(self.app.config["SQLALCHEMY_DATABASE_URI"])
+        if url.database in (None, "", ":memory:"):
+            raise RuntimeError("the async app needs a file backed database")
+        # same resolution flask-sqlalchemy uses for relative paths
+        return os.path.join(self.app.root_path, url.database)
+
+    async def connect(self):
+        conn = await aiosqlite.connect(self.path())
+        for name, value in sqlite_pragmas():
+            await conn.execute("PRAGMA {}={}".format(name, value))
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        if self.idle is None:
+            self.idle = asyncio.LifoQueue()
+
+        if self.idle.empty() and self.created < self.size:
+            self.created += 1
+            try:
+                conn = await self.connect()
+            except BaseException:
+                self.created -= 1
+                raise
+        else:
+            conn = await self.idle.get()
+
+        try:
+            yield conn
+        finally:
+            self.idle.put_nowait(conn)
+
+    async def fetchall(self, statement, **values):
+        async with self.connection() as conn:
+            cursor = await conn.execute(
+                statement.sql, statement.params(values)
+            )
+            try:
+                return await cursor.fetchall()
+            finally:
+                await cursor.close()
+
+    async def close(self):
+        while self.idle is not None and not self.idle.empty():
+            await self.idle.get_nowait().close()
+            self.created -= 1
+
+
+class Request(object):
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {}
+        for key, value in parse_qsl(scope["query_string"].decode("latin-1")):
+            self.args.setdefault(key, value)
+        self.headers = {
+            key.decode("latin-1").lower(): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+
+    def authorization(self):
+        value = self.headers.get("authorization", "")
+        scheme, _, credentials = value.partition(" ")
+        if scheme.lower() != "basic":
+            return None, None
+        try:
+            decoded = base64.b64decode(credentials).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError):
+            return None, None
+        username, _, password = decoded.partition(":")
+        return username, password
+
+
+async def respond(send, status, body, headers=()):
+    data = body if isinstance(body, bytes) else dumps(body)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(data)).encode("ascii")),
+        ] + [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+def fmt(row, viewers):
+    return meeting_document(row[0], row[1], row[2], viewers.get(row[2], []))
+
+
+# ASGI application serving the read heavy routes with async handlers over
+# aiosqlite. Every other route is handed to the flask app on a thread pool
+# so a single server speaks the whole API. Argument parsing, ETags and the
+# documents come from fuze.views and MEETING_SUMMARY is honoured, but the
+# async routes (GET /health, /meeting, /view and /download) skip the flask
+# request hooks and so ignore
+#
+#   MEETING_COALESCE   every request runs its own queries
+#   READ_REPLICAS      every read goes to the primary
+#   COMPRESS*          bodies are sent uncompressed
+#   SLOW_REQUEST_*     no timing header or slow request log
+#   METRICS_*          not counted on /metrics
+class AsyncApp(object):
+
+    def __init__(self, app):
+        self.app = app
+        self.db = Database(app)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get("ASGI_WSGI_THREADS", 8)
+        )
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/meeting"): self.meeting_get,
+            ("GET", "/view"): self.meeting_view,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        request = Request(scope)
+        handler = self.routes.get((request.method, request.path))
+        if handler is None and request.method == "GET" and \
+                request.path.startswith("/download/"):
+            handler = self.download
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        try:
+            await handler(request, send)
+        except HTTPException as e:
+            await respond(send, e.code, {
+                "code": e.code,
+                "message": e.description,
+            }, [
+                (k, v) for k, v in e.get_headers()
+                if k.lower() != "content-type"
+            ])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.db.close()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def health(self, request, send):
+        await respond(send, 200, {"message": ":D"})
+
+    async def download(self, request, send):
+        token = request.path[len("/download/"):]
+        remaining = verify_download(token, request.args)
+        headers = download_headers(token, remaining)
+        etags = parse_etags(request.headers.get("if-none-match"))
+        if etags.contains_weak(token):
+            return await respond(send, 304, b"", headers)
+        await respond(
+            send, 200, {"redirected": "to s3 to get your recording"}, headers
+        )
+
+    async def meetings(self, after, limit):
+        rows = await self.db.fetchall(
+            MEETINGS, after=after, limit=-1 if limit is None else limit
+        )
+        viewers = {}
+        if rows:
+            for rid, email in await self.db.fetchall(
+                VIEWERS, first=rows[0][0], last=rows[-1][0]
+            ):
+                viewers.setdefault(rid, []).append(email)
+        return rows, viewers
+
+    async def not_modified(self, request, send, etag):
+        etags = parse_etags(request.headers.get("if-none-match"))
+        if not etags.contains_weak(etag):
+            return False
+        await respond(send, 304, b"", [("ETag", quote_etag(etag))])
+        return True
+
+    def summaries(self):
+        return self.app.config.get("MEETING_SUMMARY", False)
+
+    async def meeting_get(self, request, send):
+        meeting_id = request.args.get("meeting_id", "all")
+        if meeting_id != "all":
+            meeting_id = parse_meeting_id(meeting_id)
+
+            if "if-none-match" in request.headers:
+                rows = await self.db.fetchall(MEETING_VERSION, id=meeting_id)
+                if rows and await self.not_modified(
+                    request, send, meeting_etag(meeting_id, rows[0][0])
+                ):
+                    return
+
+            if self.summaries():
+                rows = await self.db.fetchall(SUMMARY, id=meeting_id)
+                if not rows:
+                    raise errors.MeetingDoesNotExist
+                etag = meeting_etag(meeting_id, rows[0][0])
+                return await respond(
+                    send, 200, rows[0][1].encode("utf-8"),
+                    [("ETag", quote_etag(etag))]
+                )
+
+            rows = await self.db.fetchall(MEETING, id=meeting_id)
+            if not rows:
+                raise errors.MeetingDoesNotExist
+            viewers = {}
+            for rid, email in await self.db.fetchall(
+                VIEWERS, first=rows[0][0], last=rows[0][0]
+            ):
+                viewers.setdefault(rid, []).append(email)
+            etag = meeting_etag(meeting_id, rows[0][3])
+            return await respond(
+                send, 200, fmt(rows[0], viewers), [("ETag", quote_etag(etag))]
+            )
+
+        rows = await self.db.fetchall(VERSION, name="meetings")
+        etag = listing_etag(rows[0][0] if rows else 0)
+        if await self.not_modified(request, send, etag):
+            return
+        headers = [("ETag", quote_etag(etag))]
+
+        after = positive_int(
+            request.args.get("after"), errors.InvalidPagination
+        )
+        if request.args.get("stream") == "true":
+            return await self.stream(send, after, headers)
+
+        limit = page_limit(
+            positive_int(request.args.get("limit"), errors.InvalidPagination),
+            self.app.config
+        )
+
+        if self.summaries():
+            rows = await self.db.fetchall(
+                SUMMARIES, after=after or 0,
+                limit=-1 if limit is None else limit
+            )
+            next_cursor = None
+            if limit is not None and len(rows) == limit:
+                next_cursor = rows[-1][0]
+            return await respond(send, 200, summary_page(
+                [row[1] for row in rows], next_cursor
+            ).encode("utf-8"), headers)
+
+        rows, viewers = await self.meetings(after or 0, limit)
+        next_cursor = None
+        if limit is not None and len(rows) == limit:
+            next_cursor = rows[-1][0]
+        await respond(send, 200, {
+            "results": [fmt(row, viewers) for row in rows],
+            "next_cursor": next_cursor,
+        }, headers)
+
+    async def documents(self, after, batch):
+        if self.summaries():
+            rows = await self.db.fetchall(SUMMARIES, after=after, limit=batch)
+            return [row[0] for row in rows], [
+                row[1].encode("utf-8") for row in rows
+            ]
+        rows, viewers = await self.meetings(after, batch)
+        return [row[0] for row in rows], [
+            dumps(fmt(row, viewers)) for row in rows
+        ]
+
+    async def stream(self, send, after, headers=()):
+        batch = self.app.config.get("MEETING_STREAM_BATCH", 500)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")] + [
+                (k.encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ],
+        })
+
+        body = {"type": "http.response.body", "more_body": True}
+        await send(dict(body, body=b'{"results":['))
+        after, sep = after or 0, b""
+        while True:
+            ids, documents = await self.documents(after, batch)
+            for document in documents:
+                await send(dict(body, body=sep + document))
+                sep = b","
+            if len(ids) < batch:
+                break
+            after = ids[-1]
+        await send({"type": "http.response.body", "body": b"]}"})
+
+    async def meeting_view(self, request, send):
+        token = bearer_token(request.headers.get("authorization"))
+        if token is not None:
+            grant = verify_view_token(
+                token, parse_meeting_id(request.args.get("meeting_id", ""))
+            )
+            await respond(send, 302, b"{}", [
+                ("Location", download_url(grant.url, grant.viewer))
+            ])
+            return
+
+        username, password = request.authorization()
+        if not username or not password:
+            raise errors.InvalidCredentials
+
+        meeting_id = parse_meeting_id(request.args.get("meeting_id", ""))
+
+        rows = await self.db.fetchall(RECORDING, id=meeting_id)
+        if not rows:
+            raise errors.InvalidCredentials
+        rid, url, owner, public, pwhash, version = rows[0]
+        key = (
+            meeting_id, username, authorizations.digest(password), version
+        )
+        allowed = authorizations.get(key)
+
+        if allowed is None:
+            generation = authorizations.generation
+            # the KDF runs on the hashing pool, keep the event loop free.
+            # Upgrading an old hash is a write, it is left to the sync path
+            # and no replacement is hashed here
+            valid, _ = await asyncio.get_running_loop().run_in_executor(
+                self.executor, verify_password, password, pwhash
+            )
+            if not valid:
+                allowed = False
+            elif not public:
+                allowed = owner == username
+            else:
+                allowed = (await self.db.fetchall(
+                    VIEWER_EXISTS, rid=rid, email=username
+                ))[0][0] == 1
+            authorizations.set(key, allowed, rid, generation)
+
+        if not allowed:
+            raise errors.InvalidCredentials
+        await respond(send, 302, b"{}", [
+            ("Location", download_url(url, username))
+        ])
+
+    async def wsgi(self, scope, receive, send):
+        body, more = [], True
+        while more:
+            message = await receive()
+            body.append(message.get("body", b""))
+            more = message.get("more_body", False)
+
+        environ = self.environ(scope, b"".join(body))
+        status, headers, data = await asyncio.get_running_loop() \
+            .run_in_executor(self.executor, self.call_wsgi, environ)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (k.encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    def environ(self, scope, body):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": scope["path"],
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": "HTTP/{}".format(scope["http_version"]),
+            "REMOTE_ADDR": client[0],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for key, value in scope["headers"]:
+            key = key.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if key == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif key != "CONTENT_LENGTH":
+                name = "HTTP_" + key
+                if name in environ:
+                    value = environ[name] + "," + value
+                environ[name] = value
+        return environ
+
+    def call_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = headers
+
+        result = self.app(environ, start_response)
+        try:
+            data = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return started["status"], started["headers"], data
@@ -0,0 +1,252 @@
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from fuze import app
+
+
+class TTLCache(object):
+
+    def __init__(self, size=1024, ttl=60, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < self.clock():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._discard(next(iter(self._data)))
+
+    def pop(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+        }
+
+    def _discard(self, key):
+        self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# allow/deny decisions for /view keyed on (meeting_id, username, digest,
+# meeting version), indexed by recording and user so a change to either
+# drops exactly the decisions that depended on it in this worker. Other
+# workers stop using theirs because the version in the key moved on
+class AuthorizationCache(TTLCache):
+
+    def __init__(self, *args, **kwargs):
+        super(AuthorizationCache, self).__init__(*args, **kwargs)
+        self.generation = 0
+        self._secret = os.urandom(32)
+        self._owners = {}
+        self._recordings = {}
+        self._users = {}
+
+    def digest(self, password):
+        return hmac.new(
+            self._secret, password.encode("utf-8"), sha256
+        ).digest()
+
+    def set(self, key, value, recording_id=None, generation=None):
+        with self._lock:
+            # something was invalidated while the decision was being
+            # computed, it may already be stale so don't keep it
+            if generation is not None and generation != self.generation:
+                return
+
+            self._discard(key)
+            self._owners[key] = recording_id
+            self._recordings.setdefault(recording_id, set()).add(key)
+            self._users.setdefault(key[1], set()).add(key)
+            super(AuthorizationCache, self).set(key, value)
+
+    def invalidate(self, recordings=(), users=()):
+        with self._lock:
+            self.generation += 1
+            for rid in recordings:
+                for key in list(self._recordings.get(rid, ())):
+                    self._discard(key)
+            for email in users:
+                for key in list(self._users.get(email, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            super(AuthorizationCache, self).clear()
+            self.generation += 1
+            self._owners.clear()
+            self._recordings.clear()
+            self._users.clear()
+
+    def _discard(self, key):
+        self._data.pop(key, None)
+        if key not in self._owners:
+            return
+
+        rid = self._owners.pop(key)
+        for index, name in ((self._recordings, rid), (self._users, key[1])):
+            keys = index.get(name)
+            keys.discard(key)
+            if not keys:
+                del index[name]
+
+
+class _Call(object):
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_missing = object()
+
+
+# concurrent calls for the same key in one worker share a single call of
+# fn, the first caller runs it and the others wait for its result. Results
+# are kept for ttl seconds to absorb the rest of a burst and all of them go
+# on invalidate(), a worker never serves anything older than its own last
+# commit. Values are shared between threads so they must be immutable
+class SingleFlight(object):
+
+    def __init__(self, size=1024, ttl=0.5, timeout=5, clock=time.monotonic):
+        self.results = TTLCache(size, ttl, clock)
+        self.timeout = timeout
+        self.generation = 0
+        self.hits = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            value = self.results.get(key, _missing)
+            if value is not _missing:
+                self.hits += 1
+                return value
+
+            call = self._calls.get(key)
+            # a call started before the last invalidation may be stale
+            leader = call is None or call.generation != self.generation
+            if leader:
+                call = self._calls[key] = _Call(self.generation)
+                self.fetches += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                return fn(*args)
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                if call.error is None and call.generation == self.generation:
+                    self.results.set(key, call.value)
+            call.done.set()
+        return call.value
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self.results.clear()
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.results.clear()
+            self.hits = 0
+            self.fetches = 0
+            self.coalesced = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "fetches": self.fetches,
+                "coalesced": self.coalesced,
+                "hits": self.hits,
+            }
+
+
+# per recording counters bumped by every commit that changes its viewers,
+# visibility or meeting, /view tokens carry the counter they were issued
+# under and older ones are refused. Per worker, a worker that hasn't seen
+# the change keeps accepting a token until it expires
+class Generations(object):
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._values.get(key, 0)
+
+    def bump(self, keys):
+        with self._lock:
+            for key in keys:
+                self._values[key] = self._values.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+
+authorizations = AuthorizationCache(
+    app.config.get("AUTH_CACHE_SIZE", 10000),
+    app.config.get("AUTH_CACHE_TTL", 30),
+)
+
+meeting_reads = SingleFlight(
+    app.config.get("MEETING_COALESCE_SIZE", 1024),
+    app.config.get("MEETING_COALESCE_TTL", 0.5),
+)
+
+view_generations = Generations()
@@ -0,0 +1,129 @@
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip and deflate are offered without it
+    brotli = None
+
+
+# zlib streams for gzip and deflate, brotli when it is installed. chunk()
+# returns whatever compressed output is ready, flush() forces out everything
+# given so far, finish() ends the stream
+class ZlibStream(object):
+
+    def __init__(self, wbits, level):
+        self.stream = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def chunk(self, data):
+        return self.stream.compress(data)
+
+    def flush(self):
+        return self.stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.stream.flush()
+
+
+class BrotliStream(object):
+
+    def __init__(self, quality):
+        self.stream = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self.stream.process(data)
+
+    def flush(self):
+        return self.stream.flush()
+
+    def finish(self):
+        return self.stream.finish()
+
+
+def encodings():
+    offered = ["gzip", "deflate"]
+    if brotli is not None:
+        offered.insert(0, "br")
+    return offered
+
+
+def stream_for(encoding, config):
+    level = config.get("COMPRESS_LEVEL", 6)
+    if encoding == "br":
+        return BrotliStream(config.get("COMPRESS_BROTLI_QUALITY", 4))
+    if encoding == "gzip":
+        return ZlibStream(16 + zlib.MAX_WBITS, level)
+    return ZlibStream(zlib.MAX_WBITS, level)
+
+
+def compress(encoding, data, config):
+    stream = stream_for(encoding, config)
+    return stream.chunk(data) + stream.finish()
+
+
+# compresses a streamed body as it is produced, output is flushed whenever
+# COMPRESS_STREAM_FLUSH bytes of input have gone in so clients see progress
+# without the whole body being held
+def compress_iter(encoding, iterable, config):
+    stream = stream_for(encoding, config)
+    threshold = config.get("COMPRESS_STREAM_FLUSH", 64 * 1024)
+    pending = 0
+    try:
+        for data in iterable:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            out = stream.chunk(data)
+            pending += len(data)
+            if pending >= threshold:
+                out += stream.flush()
+                pending = 0
+            if out:
+                yield out
+        yield stream.finish()
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+def compressible(response, config):
+    return (
+        200 <= response.status_code < 300 and
+        response.status_code != 204 and
+        "Content-Encoding" not in response.headers and
+        response.mimetype in config.get(
+            "COMPRESS_MIMETYPES", ["application/json"]
+        )
+    )
+
+
+def init_app(app):
+
+    @app.after_request
+    def compress_response(response):
+        config = app.config
+        if not config.get("COMPRESS", True) or \
+                not compressible(response, config):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(encodings())
+        if encoding is None or request.method == "HEAD":
+            return response
+
+        if response.is_streamed:
+            response.response = compress_iter(
+                encoding, response.response, config
+            )
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < config.get("COMPRESS_MIN_SIZE", 1024):
+                return response
+            response.set_data(compress(encoding, data, config))
+
+        response.headers["Content-Encoding"] = encoding
+        # the body differs per encoding so the validator can only be weak
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -6,6 +6,16 @@ class PreexistingUser(ex.HTTPException):
     description = "A user with that email already exists"
 
 
+class UnknownUser(ex.HTTPException):
+    code = 404
+    description = "A user with that email does not exist"
+
+
+class PreexistingViewer(ex.HTTPException):
+    code = 409
+    description = "That user can already view the recording"
+
+
 class InvalidPassword(ex.HTTPException):
     code = 401
     description = "Password required"
@@ -26,6 +36,11 @@ class InvalidMeetingId(ex.HTTPException):
     description = "Meeting id must be an int or 'all'"
 
 
+class InvalidPagination(ex.HTTPException):
+    code = 400
+    description = "limit and after must be positive ints"
+
+
 class InvalidRecordingId(ex.HTTPException):
     code = 404
     description = "Recording id not found"
@@ -36,6 +51,26 @@ class InvalidCredentials(ex.HTTPException):
     description = "Invalid username or password"
 
 
+class InvalidViewToken(ex.HTTPException):
+    code = 401
+    description = "View token is invalid, expired or revoked"
+
+
+class InvalidDownloadUrl(ex.HTTPException):
+    code = 403
+    description = "Download link is invalid or has expired"
+
+
+class HashingBusy(ex.HTTPException):
+    code = 503
+    description = "Too many password checks in progress, try again shortly"
+    retry_after = 1
+
+    def get_headers(self, environ=None):
+        headers = super(HashingBusy, self).get_headers(environ)
+        return headers + [("Retry-After", str(self.retry_after))]
+
+
 class SchemaValidationError(ex.HTTPException):
     code = 400
 
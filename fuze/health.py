@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from fuze import db
+from fuze.cache import TTLCache
+
+
+PROBE = "SELECT 1 FROM meeting LIMIT 1"
+
+
+class Readiness(object):
+
+    def __init__(self, window=1000):
+        self.latencies = deque(maxlen=window)
+        self.cache = TTLCache(size=1)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed):
+        self.latencies.append(elapsed)
+
+    def p99(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+    def probe_database(self, engine, timeout):
+        def run():
+            start = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(PROBE).fetchall()
+            return time.perf_counter() - start
+
+        with self._lock:
+            # a probe stuck on a locked database keeps the only probe thread,
+            # report it instead of queueing more work behind it
+            if self._pending is not None and not self._pending.done():
+                return {"ok": False, "error": "previous probe still running"}
+            self._pending = self._executor.submit(run)
+            future = self._pending
+
+        try:
+            elapsed = future.result(timeout)
+        except TimeoutError:
+            return {
+                "ok": False, "error": "timed out after {}s".format(timeout)
+            }
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": elapsed * 1000}
+
+    # max_overflow is what the pool was built with, see SQLITE_MAX_OVERFLOW
+    # in apply_driver_hacks
+    def pool(self, engine, max_overflow):
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return None
+        capacity = pool.size() + max(0, max_overflow)
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "saturation": pool.checkedout() / capacity if capacity else 0.0,
+        }
+
+    def check(self, config):
+        report = self.cache.get("ready")
+        if report is not None:
+            return dict(report, cached=True)
+
+        self.cache.ttl = config.get("READINESS_CACHE_SECONDS", 2)
+        engine = db.engine
+        p99 = self.p99()
+        report = {
+            "database": self.probe_database(
+                engine, config.get("READINESS_TIMEOUT", 0.5)
+            ),
+            "pool": self.pool(
+                engine, config.get("SQLITE_MAX_OVERFLOW", 10)
+            ),
+            "p99_ms": p99 * 1000 if p99 is not None else None,
+        }
+        report["ready"] = report["database"]["ok"]
+        self.cache.set("ready", report)
+        return dict(report, cached=False)
+
+
+readiness = Readiness()
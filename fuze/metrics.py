@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import time
+from flask import request
+from fuze import db
+from fuze import timing
+from fuze.cache import authorizations, meeting_reads
+from fuze.health import readiness
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "fuze_http_requests_total": ("counter", "Requests by route and status"),
+    "fuze_http_request_duration_seconds": (
+        "histogram", "Request latency by route"
+    ),
+    "fuze_http_errors_total": ("counter", "Error responses by error class"),
+    "fuze_db_queries_total": ("counter", "SQL statements by route"),
+    "fuze_db_query_seconds_total": ("counter", "Time spent in SQL by route"),
+    "fuze_db_pool_size": ("gauge", "Connections kept in the pool"),
+    "fuze_db_pool_checked_out": ("gauge", "Connections in use"),
+    "fuze_db_pool_overflow": ("gauge", "Connections opened past pool_size"),
+    "fuze_auth_cache_hits": ("gauge", "/view authorization cache hits"),
+    "fuze_auth_cache_misses": ("gauge", "/view authorization cache misses"),
+    "fuze_auth_cache_size": ("gauge", "/view authorization cache entries"),
+    "fuze_meeting_reads_fetches": (
+        "gauge", "Meeting reads that went to the database"
+    ),
+    "fuze_meeting_reads_coalesced": (
+        "gauge", "Meeting reads that waited on another request's fetch"
+    ),
+    "fuze_meeting_reads_hits": (
+        "gauge", "Meeting reads served from a just fetched result"
+    ),
+}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r'\"') \
+        .replace("\n", r"\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(k, _escape(v)) for k, v in pairs
+    ) + "}"
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# counters, histograms and gauges for one process. When METRICS_DIR is set
+# every worker periodically writes its snapshot to its own file there and a
+# scrape on any worker merges all of them, so one scrape sees the whole
+# gunicorn server
+class Registry(object):
+
+    def __init__(self):
+        self.app = None
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.flushed = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def inc(self, name, labels, value=1):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(BUCKETS)] += 1
+            hist[-1] += value
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+
+    def update_gauges(self):
+        pool = db.engine.pool
+        if hasattr(pool, "checkedout"):
+            self.set("fuze_db_pool_size", {}, pool.size())
+            self.set("fuze_db_pool_checked_out", {}, pool.checkedout())
+            self.set("fuze_db_pool_overflow", {}, max(0, pool.overflow()))
+
+        stats = authorizations.stats()
+        for name in ("hits", "misses", "size"):
+            self.set("fuze_auth_cache_" + name, {}, stats[name])
+
+        stats = meeting_reads.stats()
+        for name in ("fetches", "coalesced", "hits"):
+            self.set("fuze_meeting_reads_" + name, {}, stats[name])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[n, l, v] for (n, l), v in self.counters.items()],
+                "histograms": [
+                    [n, l, v] for (n, l), v in self.histograms.items()
+                ],
+                "gauges": [[n, l, v] for (n, l), v in self.gauges.items()],
+            }
+
+    def directory(self):
+        return self.app.config.get("METRICS_DIR") if self.app else None
+
+    def flush(self, force=False):
+        path = self.directory()
+        interval = self.app.config.get("METRICS_FLUSH_INTERVAL", 1.0)
+        now = time.monotonic()
+        if path is None or (not force and now - self.flushed < interval):
+            return
+        self.flushed = now
+
+        self.update_gauges()
+        os.makedirs(path, exist_ok=True)
+        target = os.path.join(path, "{}.json".format(os.getpid()))
+        with open(target + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(target + ".tmp", target)
+
+    def collect(self):
+        path = self.directory()
+        if path is None:
+            self.update_gauges()
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            snapshots = []
+            for name in os.listdir(path):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(path, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms, gauges = {}, {}, {}
+        for snap in snapshots:
+            for name, labels, value in snap["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in snap["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [0] * len(value))
+                for i, v in enumerate(value):
+                    merged[i] += v
+            # counters of exited workers still count, their gauges don't
+            if snap["pid"] != os.getpid() and not _alive(snap["pid"]):
+                continue
+            for name, labels, value in snap["gauges"]:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        return counters, histograms, gauges
+
+    def render(self):
+        counters, histograms, gauges = self.collect()
+        lines = []
+        families = {}
+        for store in (counters, histograms, gauges):
+            for name, labels in store:
+                families.setdefault(name, []).append((store, labels))
+
+        for name in sorted(families):
+            kind, description = HELP.get(name, ("untyped", name))
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for store, labels in sorted(families[name], key=lambda e: e[1]):
+                value = store[(name, labels)]
+                if store is not histograms:
+                    lines.append("{}{} {}".format(
+                        name, _labels(labels), _fmt(value)
+                    ))
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), value):
+                    cumulative += count
+                    lines.append("{}_bucket{} {}".format(
+                        name, _labels(labels + (("le", _fmt(bound)),)),
+                        cumulative
+                    ))
+                lines.append("{}_sum{} {}".format(
+                    name, _labels(labels), _fmt(float(value[-1]))
+                ))
+                lines.append("{}_count{} {}".format(
+                    name, _labels(labels), cumulative
+                ))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# run by the gunicorn master before it forks, see gunicorn.conf.py. Files
+# left by an earlier server would otherwise be merged into this one's
+def clear_directory(path):
+    if path is None or not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        if name.endswith((".json", ".json.tmp")):
+            os.remove(os.path.join(path, name))
+
+
+def route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def init_app(app):
+    registry.init_app(app)
+
+    @app.after_request
+    def record_request(response):
+        current = timing.current()
+        labels = {"route": route(), "method": request.method}
+        registry.inc("fuze_http_requests_total", dict(
+            labels, status=str(response.status_code)
+        ))
+        if current is not None:
+            registry.observe(
+                "fuze_http_request_duration_seconds", labels, current.elapsed
+            )
+            if not labels["route"].startswith(("/health", "/metrics")):
+                readiness.observe(current.elapsed)
+            registry.inc("fuze_db_queries_total", labels, current.queries)
+            registry.inc(
+                "fuze_db_query_seconds_total", labels, current.db_time
+            )
+        registry.flush()
+        return response
+
+    @app.teardown_request
+    def record_exception(exception=None):
+        if exception is not None:
+            error(exception)
+
+
+def error(exception):
+    registry.inc(
+        "fuze_http_errors_total", {"error": exception.__class__.__name__}
+    )
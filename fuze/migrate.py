@@ -0,0 +1,179 @@
+import argparse
+import json
+import sys
+from fuze import db
+from fuze import models  # noqa, registers the tables on db.metadata
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+# Brings an existing SQLite database up to the schema in fuze/models.py.
+# Missing tables and indexes are created. SQLite can't change a column or
+# foreign key in place, so a table whose columns or ON DELETE actions differ
+# is rebuilt the way the SQLite docs describe: create the new table, copy the
+# rows, drop the old one and rename, with foreign keys off and checked again
+# before the commit. Rows that would break a new unique index are deleted
+# first, the oldest (lowest rowid) of each duplicate is kept.
+#
+#   python -m fuze.migrate [--dry-run]
+
+
+def ddl(element):
+    return str(element.compile(dialect=sqlite.dialect())).strip()
+
+
+def existing_tables(conn):
+    return {
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+
+
+def existing_indexes(conn):
+    return {
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+
+
+def columns(conn, name):
+    return [row[1] for row in conn.execute('PRAGMA table_info("{}")'.format(
+        name
+    ))]
+
+
+def foreign_keys(conn, name):
+    return {
+        (row[3], row[2], row[4], row[6])
+        for row in conn.execute('PRAGMA foreign_key_list("{}")'.format(name))
+    }
+
+
+def expected_foreign_keys(table):
+    return {
+        (
+            fk.parent.name, fk.column.table.name, fk.column.name,
+            (fk.ondelete or "NO ACTION").upper(),
+        )
+        for fk in table.foreign_keys
+    }
+
+
+def outdated(conn, table):
+    return (
+        set(columns(conn, table.name)) != {c.name for c in table.columns} or
+        foreign_keys(conn, table.name) != expected_foreign_keys(table)
+    )
+
+
+def rebuild(conn, table):
+    temp = "_migrate_{}".format(table.name)
+    create = ddl(CreateTable(table)).replace(
+        "CREATE TABLE {} (".format(table.name),
+        "CREATE TABLE {} (".format(temp), 1
+    )
+    copied = [
+        '"{}"'.format(name) for name in columns(conn, table.name)
+        if name in table.columns
+    ]
+    conn.execute(create)
+    conn.execute("INSERT INTO {} ({}) SELECT {} FROM \"{}\"".format(
+        temp, ", ".join(copied), ", ".join(copied), table.name
+    ))
+    conn.execute('DROP TABLE "{}"'.format(table.name))
+    conn.execute('ALTER TABLE {} RENAME TO "{}"'.format(temp, table.name))
+
+
+def drop_duplicates(conn, index):
+    names = ['"{}"'.format(column.name) for column in index.columns]
+    # NULLs never collide in a unique index
+    result = conn.execute(
+        'DELETE FROM "{table}" WHERE {present} AND rowid NOT IN '
+        '(SELECT MIN(rowid) FROM "{table}" GROUP BY {columns})'.format(
+            table=index.table.name,
+            present=" AND ".join(name + " IS NOT NULL" for name in names),
+            columns=", ".join(names),
+        )
+    )
+    return result.rowcount
+
+
+def plan(conn, metadata):
+    tables = existing_tables(conn)
+    steps = []
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            steps.append(("create", table))
+        elif outdated(conn, table):
+            steps.append(("rebuild", table))
+    return steps
+
+
+def migrate(engine, metadata=None, dry_run=False):
+    metadata = metadata if metadata is not None else db.metadata
+    done = []
+    with engine.connect() as conn:
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            steps = plan(conn, metadata)
+            indexes = existing_indexes(conn)
+            if dry_run:
+                return [
+                    "{} {}".format(action, table.name)
+                    for action, table in steps
+                ]
+
+            with conn.begin():
+                # pysqlite leaves DDL outside of transactions unless told
+                conn.execute("BEGIN")
+                for action, table in steps:
+                    if action == "create":
+                        conn.execute(ddl(CreateTable(table)))
+                    else:
+                        rebuild(conn, table)
+                    done.append("{} {}".format(action, table.name))
+                    # the old table's indexes went with it
+                    indexes -= {index.name for index in table.indexes}
+
+                for table in metadata.sorted_tables:
+                    for index in table.indexes:
+                        if index.name not in indexes:
+                            if index.unique:
+                                dropped = drop_duplicates(conn, index)
+                                if dropped:
+                                    done.append("drop {} duplicate {}".format(
+                                        dropped, table.name
+                                    ))
+                            conn.execute(ddl(CreateIndex(index)))
+                            done.append("index {}".format(index.name))
+
+                broken = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if broken:
+                    raise RuntimeError(
+                        "foreign key violations after migrating: {}".format(
+                            broken[:10]
+                        )
+                    )
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bring an existing SQLite database up to date"
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    with db.get_app().app_context():
+        print(json.dumps(
+            migrate(db.engine, dry_run=args.dry_run), indent=2
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
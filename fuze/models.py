@@ -1,55 +1,252 @@
+import json
+import sqlite3
 import uuid
-from fuze import db
+from collections import namedtuple
+from itertools import chain
+from fuze import app, db
 from fuze import errors
-from sqlalchemy import event
+from fuze.cache import authorizations, meeting_reads, view_generations
+from fuze.passwords import hash_password, verify_password
+from fuze.serialization import dumps
+from sqlalchemy import event, select, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import joinedload, relationship
 from sqlalchemy.schema import ForeignKey
-from hashlib import sha256
 
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
+    for name, value in sqlite_pragmas():
+        cursor.execute("PRAGMA {}={}".format(name, value))
     cursor.close()
 
 
+def sqlite_pragmas():
+    pragmas = [("foreign_keys", "ON")]
+    if app.config.get("SQLITE_MODE") == "sqlite-prod":
+        pragmas += app.config.get("SQLITE_PROD_PRAGMAS", [])
+    return pragmas
+
+
+def invalidate(recordings=(), users=()):
+    pending = db.session.info.setdefault("invalidate", (set(), set()))
+    pending[0].update(recordings)
+    pending[1].update(users)
+
+
+def insert_many(model, rows, limit=999):
+    # one multi-row INSERT OR IGNORE per chunk, kept under SQLite's bound
+    # parameter limit. Returns the rows that went in, rows another request
+    # committed first are ignored rather than failing the whole batch
+    inserted = []
+    if not rows:
+        return inserted
+    keys = sorted(rows[0])
+    size = max(1, limit // len(keys))
+    for i in range(0, len(rows), size):
+        chunk = rows[i:i + size]
+        if not RETURNING:
+            inserted.extend(
+                row for row in chunk if insert_or_ignore(model, **row)
+            )
+            continue
+
+        found = set(
+            tuple(row) for row in db.session.execute(
+                *insert_returning(model, keys, chunk)
+            )
+        )
+        inserted.extend(
+            row for row in chunk if tuple(row[key] for key in keys) in found
+        )
+    return inserted
+
+
+# SQLite names the rows an INSERT added with RETURNING from 3.35 on, older
+# versions insert row by row and read each row count instead
+RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+# SQLAlchemy 1.3 can't compile RETURNING for SQLite
+def insert_returning(model, keys, rows):
+    columns = ", ".join('"{}"'.format(key) for key in keys)
+    values = ", ".join(
+        "({})".format(", ".join(":{}_{}".format(key, i) for key in keys))
+        for i in range(len(rows))
+    )
+    params = {
+        "{}_{}".format(key, i): row[key]
+        for i, row in enumerate(rows) for key in keys
+    }
+    sql = 'INSERT OR IGNORE INTO "{}" ({}) VALUES {} RETURNING {}'.format(
+        model.__tablename__, columns, values, columns
+    )
+    return text(sql), params
+
+
+def insert_or_ignore(model, **values):
+    # a single INSERT OR IGNORE, the unique keys settle races between
+    # workers and the row count says whether this one was new
+    result = db.session.execute(
+        model.__table__.insert().prefix_with("OR IGNORE").values(**values)
+    )
+    return result.rowcount == 1
+
+
+def select_in(column, values, *criteria):
+    found = set()
+    for i in range(0, len(values), 500):
+        found.update(
+            row[0] for row in db.session.query(column).filter(
+                column.in_(values[i:i + 500]), *criteria
+            )
+        )
+    return found
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_invalidations(session, flush_context):
+    recordings, users = session.info.setdefault("invalidate", (set(), set()))
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Viewer, Meeting)):
+            recordings.add(obj.recording_id)
+        elif isinstance(obj, Recording):
+            recordings.add(obj.id)
+        elif isinstance(obj, User):
+            users.add(obj.email)
+
+
+# every commit that touched a recording, its viewers or its meeting bumps
+# the version of the whole listing and stamps that meeting with it, GET
+# /meeting turns them into ETags. SQLite hands a deleted meeting's id to the
+# next one, a counter that never goes back keeps their ETags apart
+@event.listens_for(db.session, "before_commit")
+def bump_versions(session):
+    session.flush()
+    recordings = session.info.get("invalidate", ((), ()))[0]
+    if not recordings:
+        return
+
+    Version.bump(session, "meetings")
+    current = select([Version.value]).where(Version.name == "meetings")
+    session.query(Meeting).filter(
+        Meeting.recording_id.in_(recordings)
+    ).update({Meeting.version: current.as_scalar()}, synchronize_session=False)
+
+
+# with MEETING_SUMMARY on the same commits rewrite the stored documents of
+# the meetings they touched
+@event.listens_for(db.session, "before_commit")
+def refresh_summaries(session):
+    if not app.config.get("MEETING_SUMMARY"):
+        return
+    session.flush()
+    recordings = session.info.get("invalidate", ((), ()))[0]
+    if recordings:
+        MeetingSummary.refresh(session, sorted(recordings))
+
+
+@event.listens_for(db.session, "after_commit")
+def apply_invalidations(session):
+    recordings, users = session.info.pop("invalidate", ((), ()))
+    reread = session.info.pop("reread", False)
+    if recordings or users or reread:
+        # reads first, an authorization computed from a read taken before
+        # this commit must see the old generation and be dropped. /view
+        # tokens last, one issued under the new generation was checked
+        # against fresh data
+        meeting_reads.invalidate()
+    if recordings or users:
+        authorizations.invalidate(recordings, users)
+        view_generations.bump(recordings)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_invalidations(session):
+    session.info.pop("invalidate", None)
+    session.info.pop("reread", None)
+
+
 class User(db.Model):
     __tablename__ = "user"
 
     email = db.Column(db.Text, unique=True, primary_key=True, nullable=False)
 
-    recordings = relationship("Recording")
-    meetings = relationship("Meeting")
+    recordings = relationship("Recording", passive_deletes=True)
+    meetings = relationship("Meeting", passive_deletes=True)
 
+    # the database removes the user's recordings, meetings and viewer rows
+    # through ON DELETE CASCADE, the ids are only read for invalidation
     @classmethod
     def delete(cls, email):
-        cls.query.filter(cls.email == email).delete()
+        recordings = db.session.query(Recording.id).filter(
+            Recording.owner_email == email
+        ).union(
+            db.session.query(Meeting.recording_id).filter(
+                Meeting.host_email == email
+            ),
+            db.session.query(Viewer.recording_id).filter(
+                Viewer.viewer == email
+            ),
+        )
+        invalidate(recordings=[rid for (rid,) in recordings], users=[email])
+        cls.query.filter(cls.email == email).delete(synchronize_session=False)
 
     @classmethod
     def create(cls, email):
-        if cls.query.filter(cls.email == email).count() > 0:
+        if not insert_or_ignore(cls, email=email):
             raise errors.PreexistingUser
+        invalidate(users=[email])
 
-        db.session.add(cls(email=email))
-        db.session.commit()
+    @classmethod
+    def create_many(cls, emails):
+        existing = select_in(cls.email, emails)
+        rows = []
+        for email in emails:
+            if email not in existing:
+                existing.add(email)
+                rows.append({"email": email})
+
+        # users another request creates meanwhile are ignored by the
+        # primary key, only what this statement inserted counts as created
+        inserted = set(row["email"] for row in insert_many(cls, rows))
+        created, conflicts = [], []
+        for email in emails:
+            if email in inserted:
+                inserted.discard(email)
+                created.append(email)
+            else:
+                conflicts.append(email)
+
+        invalidate(users=created)
+        return created, conflicts
 
     def __repr__(self):
         return "<User {:s}>".format(self.email)
 
 
+RecordingAccess = namedtuple(
+    "RecordingAccess", ["id", "url", "owner_email", "public", "pwhash"]
+)
+
+
 class Recording(db.Model):
     __tablename__ = "recording"
 
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.Text, nullable=False)
-    owner_email = db.Column(db.Text, ForeignKey("user.email"))
+    owner_email = db.Column(
+        db.Text, ForeignKey("user.email", ondelete="CASCADE"), index=True
+    )
     public = db.Column(db.Boolean, default=False)
     pwhash = db.Column(db.Text)
 
     owner = relationship("User", back_populates="recordings")
-    viewers = relationship("Viewer")
+    # (recording_id, viewer) is indexed, so this order costs no sort
+    viewers = relationship(
+        "Viewer", order_by="Viewer.viewer", passive_deletes=True
+    )
 
     @classmethod
     def create(cls, owner, public=False, pw=None):
@@ -59,13 +256,13 @@ class Recording(db.Model):
         elif not public:
             recording = cls(owner_email=owner, url=url)
         else:
-            pwhash = sha256(pw.encode("utf-8")).hexdigest()
+            pwhash = hash_password(pw)
             recording = cls(
                 owner_email=owner, url=url, public=public, pwhash=pwhash
             )
 
         db.session.add(recording)
-        db.session.commit()
+        db.session.flush()
         return recording
 
     @classmethod
@@ -77,8 +274,37 @@ class Recording(db.Model):
         if not cls.public:
             raise errors.UserAddToPrivate
 
-        db.session.add(Viewer(viewer=email, recording_id=recording.id))
-        db.session.commit()
+        if Viewer.add(email, recording):
+            invalidate(recordings=[recording.id])
+
+    @classmethod
+    def share_many(cls, emails, recording):
+        users = select_in(User.email, emails)
+        viewers = select_in(
+            Viewer.viewer, emails, Viewer.recording_id == recording.id
+        )
+        rows = []
+        for email in emails:
+            if email in users and email not in viewers:
+                viewers.add(email)
+                rows.append({"viewer": email, "recording_id": recording.id})
+
+        # a concurrent share of the same viewer is ignored by the unique
+        # index, only what this statement inserted counts as shared
+        inserted = set(row["viewer"] for row in insert_many(Viewer, rows))
+        shared, conflicts = [], []
+        for email in emails:
+            if email not in users:
+                conflicts.append((email, errors.UnknownUser))
+            elif email in inserted:
+                inserted.discard(email)
+                shared.append(email)
+            else:
+                conflicts.append((email, errors.PreexistingViewer))
+
+        if shared:
+            invalidate(recordings=[recording.id])
+        return shared, conflicts
 
     @classmethod
     def set_visibility(cls, rid, vis, pw):
@@ -87,7 +313,31 @@ class Recording(db.Model):
             raise errors.InvalidRecordingId
         r.public = vis
 
-        db.session.commit()
+    def check_password(self, password):
+        # the row is about to go, an outdated hash isn't worth replacing
+        return verify_password(password, self.pwhash)[0]
+
+    # the coalesced RecordingAccess still holds the old hash and would be
+    # upgraded again, it is dropped once this commits. The meeting and its
+    # authorizations are unchanged
+    @classmethod
+    def upgrade_password(cls, rid, old, new):
+        updated = cls.query.filter(cls.id == rid, cls.pwhash == old).update(
+            {cls.pwhash: new}, synchronize_session=False
+        )
+        if updated:
+            db.session.info["reread"] = True
+
+    # what /view needs about a meeting's recording as a plain tuple, one
+    # SELECT and safe to share between requests
+    @classmethod
+    def access(cls, mid):
+        row = db.session.query(
+            cls.id, cls.url, cls.owner_email, cls.public, cls.pwhash
+        ).join(
+            Meeting, Meeting.recording_id == cls.id
+        ).filter(Meeting.id == mid).first()
+        return RecordingAccess(*row) if row is not None else None
 
     def __repr__(self):
         return "<Recording {:s} owner {}>".format(self.url, self.owner)
@@ -97,8 +347,15 @@ class Meeting(db.Model):
     __tablename__ = "meeting"
 
     id = db.Column(db.Integer, primary_key=True)
-    host_email = db.Column(db.Text, ForeignKey("user.email"))
-    recording_id = db.Column(db.Integer, ForeignKey("recording.id"))
+    host_email = db.Column(
+        db.Text, ForeignKey("user.email", ondelete="CASCADE"), index=True
+    )
+    recording_id = db.Column(
+        db.Integer, ForeignKey("recording.id", ondelete="CASCADE"), index=True
+    )
+    version = db.Column(
+        db.Integer, nullable=False, default=1, server_default="1"
+    )
 
     host = relationship("User", back_populates="meetings")
     recording = relationship("Recording")
@@ -107,35 +364,70 @@ class Meeting(db.Model):
     def create(cls, host, rid):
         meeting = cls(host_email=host, recording_id=rid)
         db.session.add(meeting)
-        db.session.commit()
+        db.session.flush()
         return meeting
 
     @classmethod
     def delete(cls, mid, password):
-        meeting = cls.query.filter(cls.id == mid).first()
+        meeting = cls.query.options(
+            joinedload(cls.recording)
+        ).filter(cls.id == mid).first()
         if meeting is None:
             raise errors.MeetingDoesNotExist(mid)
 
         if meeting.recording.pwhash is not None and password is not None:
-            pwhash = sha256(password.encode("utf-8")).hexdigest()
-            assert meeting.recording.pwhash == pwhash, errors.InvalidPassword
+            if not meeting.recording.check_password(password):
+                raise errors.InvalidPassword
+
+        # the meeting and every viewer go with the recording, ON DELETE
+        # CASCADE, one statement however many viewers there are
+        meeting.recording.delete(meeting.recording_id)
+        invalidate(recordings=[meeting.recording_id])
 
-        Viewer.query.filter(
-            Viewer.id.in_(map(lambda r: r.id, meeting.recording.viewers))
-        ).delete(synchronize_session=False)
+    @classmethod
+    def detailed(cls):
+        # host and recording come back in the same row, viewers for
+        # every recording in one extra SELECT ... IN, so a listing is
+        # two queries no matter how many meetings there are
+        return cls.query.options(
+            joinedload(cls.host),
+            joinedload(cls.recording).selectinload(Recording.viewers),
+        )
 
-        cls.query.filter(
-            cls.id == mid
-        ).delete()
+    @classmethod
+    def page(cls, after=None, limit=None):
+        query = cls.detailed()
+        if after is not None:
+            query = query.filter(cls.id > after)
+        query = query.order_by(cls.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
 
-        meeting.recording.delete(meeting.recording.id)
+    @classmethod
+    def iterate(cls, after=None, batch=500):
+        while True:
+            meetings = cls.page(after, batch)
+            for meeting in meetings:
+                yield meeting
+            if len(meetings) < batch:
+                return
+            after = meetings[-1].id
+            # drop the batch from the identity map so a full export
+            # never holds more than one page in memory
+            db.session.expunge_all()
 
     @classmethod
-    def get(cls, meeting):
+    def version_of(cls, mid):
+        return db.session.query(cls.version).filter(cls.id == mid).scalar()
+
+    @classmethod
+    def get(cls, meeting, details=False):
         if meeting == "all":
-            return cls.query.all()
-        else:
-            return cls.query.filter(cls.id == meeting).first()
+            return cls.page()
+
+        query = cls.detailed() if details else cls.query
+        return query.filter(cls.id == meeting).first()
 
     def __repr__(self):
         return "<Meeting host {}>".format(self.host.email)
@@ -143,18 +435,182 @@ class Meeting(db.Model):
 
 class Viewer(db.Model):
     __tablename__ = "viewer"
+    __table_args__ = (
+        db.Index(
+            "ix_viewer_recording_id_viewer", "recording_id", "viewer",
+            unique=True
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    viewer = db.Column(db.Text, ForeignKey("user.email"))
-    recording_id = db.Column(db.Integer, ForeignKey("recording.id"))
+    viewer = db.Column(
+        db.Text, ForeignKey("user.email", ondelete="CASCADE"), index=True
+    )
+    recording_id = db.Column(
+        db.Integer, ForeignKey("recording.id", ondelete="CASCADE")
+    )
 
     recording = relationship("Recording", back_populates="viewers")
 
     @classmethod
-    def add(cls, viewer, recording):
-        viewer = cls(viewer=viewer.email, recording_id=recording.id)
-        db.session.add(viewer)
-        db.session.commit()
+    def add(cls, email, recording):
+        return insert_or_ignore(cls, viewer=email, recording_id=recording.id)
+
+    @classmethod
+    def exists(cls, rid, email):
+        return db.session.query(
+            cls.query.filter(
+                cls.recording_id == rid, cls.viewer == email
+            ).exists()
+        ).scalar()
+
+
+def meeting_document(mid, host, rid, viewers):
+    return {
+        "meeting": {
+            "id": mid,
+            "host": host
+        },
+        "recording": {
+            "id": rid,
+        },
+        "viewers": viewers
+    }
+
+
+# GET /meeting documents stored ready to serve, one row per meeting. Kept
+# up to date by refresh_summaries, rebuild and check are for filling the
+# table and auditing it, see `python -m fuze.summary`
+class MeetingSummary(db.Model):
+    __tablename__ = "meeting_summary"
+
+    meeting_id = db.Column(db.Integer, primary_key=True)
+    recording_id = db.Column(db.Integer, index=True)
+    document = db.Column(db.Text, nullable=False)
+
+    @classmethod
+    def build(cls, session, *criteria, limit=None):
+        meetings = session.query(
+            Meeting.id, Meeting.host_email, Meeting.recording_id
+        ).filter(*criteria).order_by(Meeting.id).limit(limit).all()
+
+        rids = [m.recording_id for m in meetings]
+        viewers = {}
+        for i in range(0, len(rids), 500):
+            for rid, email in session.query(
+                Viewer.recording_id, Viewer.viewer
+            ).filter(
+                Viewer.recording_id.in_(rids[i:i + 500])
+            ).order_by(Viewer.recording_id, Viewer.viewer):
+                viewers.setdefault(rid, []).append(email)
+
+        return [{
+            "meeting_id": mid,
+            "recording_id": rid,
+            "document": dumps(
+                meeting_document(mid, host, rid, viewers.get(rid, []))
+            ).decode("utf-8"),
+        } for mid, host, rid in meetings]
+
+    @classmethod
+    def refresh(cls, session, recordings):
+        for i in range(0, len(recordings), 500):
+            chunk = recordings[i:i + 500]
+            session.query(cls).filter(
+                cls.recording_id.in_(chunk)
+            ).delete(synchronize_session=False)
+            rows = cls.build(session, Meeting.recording_id.in_(chunk))
+            if rows:
+                session.execute(cls.__table__.insert(), rows)
+
+    @classmethod
+    def batches(cls, session, batch=500):
+        after = 0
+        while True:
+            rows = cls.build(session, Meeting.id > after, limit=batch)
+            if not rows:
+                return
+            yield rows
+            after = rows[-1]["meeting_id"]
+
+    @classmethod
+    def rebuild(cls, batch=500):
+        session = db.session
+        session.query(cls).delete(synchronize_session=False)
+        count = 0
+        for rows in cls.batches(session, batch):
+            session.execute(cls.__table__.insert(), rows)
+            count += len(rows)
+        return count
+
+    # {"missing": [...], "stale": [...], "orphaned": [...]} meeting ids
+    @classmethod
+    def check(cls, batch=500):
+        session = db.session
+        report = {"missing": [], "stale": [], "orphaned": []}
+        expected = set()
+        for rows in cls.batches(session, batch):
+            stored = dict(session.query(cls.meeting_id, cls.document).filter(
+                cls.meeting_id.in_([row["meeting_id"] for row in rows])
+            ))
+            for row in rows:
+                expected.add(row["meeting_id"])
+                document = stored.get(row["meeting_id"])
+                if document is None:
+                    report["missing"].append(row["meeting_id"])
+                elif json.loads(document) != json.loads(row["document"]):
+                    report["stale"].append(row["meeting_id"])
+
+        for (mid,) in session.query(cls.meeting_id).order_by(cls.meeting_id):
+            if mid not in expected:
+                report["orphaned"].append(mid)
+        return report
+
+    @classmethod
+    def page(cls, after=None, limit=None):
+        query = db.session.query(cls.meeting_id, cls.document)
+        if after is not None:
+            query = query.filter(cls.meeting_id > after)
+        query = query.order_by(cls.meeting_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @classmethod
+    def iterate(cls, after=None, batch=500):
+        while True:
+            rows = cls.page(after, batch)
+            for row in rows:
+                yield row
+            if len(rows) < batch:
+                return
+            after = rows[-1].meeting_id
+
+    @classmethod
+    def get(cls, mid):
+        return db.session.query(cls.document).filter(
+            cls.meeting_id == mid
+        ).scalar()
+
+
+class Version(db.Model):
+    __tablename__ = "version"
+
+    name = db.Column(db.Text, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, name):
+        return db.session.query(cls.value).filter(cls.name == name).scalar() \
+            or 0
+
+    @classmethod
+    def bump(cls, session, name):
+        updated = session.query(cls).filter(cls.name == name).update(
+            {cls.value: cls.value + 1}, synchronize_session=False
+        )
+        if not updated:
+            session.execute(cls.__table__.insert().values(name=name, value=1))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fuze import app
+from fuze import errors
+from fuze.cache import TTLCache
+
+
+# Stored hashes carry their scheme and parameters so the work factor can be
+# raised later, a hash made with older settings is replaced the next time
+# its password is verified.
+#
+#   <64 hex chars>                        legacy unsalted sha256
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+
+
+def pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), salt, iterations
+    )
+
+
+def scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=2 * 128 * n * r + 1024 * 1024
+    )
+
+
+# KDF calls run on a bounded executor so a worker can't pile up unbounded
+# hashing work. hashlib releases the GIL inside pbkdf2_hmac and scrypt so
+# "thread" is the usual choice, "process" is there for KDFs that don't and
+# None hashes inline on the request thread
+class HashPool(object):
+
+    def __init__(self):
+        self.pid = None
+        self.executor = None
+        self.slots = None
+        self._lock = threading.Lock()
+
+    def configure(self):
+        kind = app.config.get("PASSWORD_POOL", "thread")
+        workers = app.config.get("PASSWORD_POOL_WORKERS", 4)
+        queue = app.config.get("PASSWORD_POOL_QUEUE", 16)
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = None
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        # a forked gunicorn worker must not reuse the master's executor
+        self.pid = os.getpid()
+
+    def run(self, func, *args):
+        with self._lock:
+            if self.pid != os.getpid():
+                self.configure()
+        if self.executor is None:
+            return func(*args)
+
+        if not self.slots.acquire(blocking=False):
+            raise errors.HashingBusy
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        return future.result()
+
+
+pool = HashPool()
+
+
+class SHA256Hasher(object):
+    name = "sha256"
+
+    def __init__(self, config=None):
+        pass
+
+    def identify(self, stored):
+        return len(stored) == 64 and "$" not in stored
+
+    def hash(self, password):
+        return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+    def verify(self, password, stored):
+        return hmac.compare_digest(self.hash(password), stored)
+
+    def needs_update(self, stored):
+        return False
+
+
+class PBKDF2Hasher(object):
+    name = "pbkdf2_sha256"
+
+    def __init__(self, config):
+        self.iterations = config.get("PASSWORD_PBKDF2_ITERATIONS", 200000)
+
+    def identify(self, stored):
+        return stored.startswith(self.name + "$")
+
+    def derive(self, password, salt, iterations):
+        return pool.run(pbkdf2, password, salt, iterations)
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        return "{}${}${}${}".format(
+            self.name, self.iterations, salt.hex(),
+            self.derive(password, salt, self.iterations).hex()
+        )
+
+    def verify(self, password, stored):
+        _, iterations, salt, expected = stored.split("$")
+        derived = self.derive(password, bytes.fromhex(salt), int(iterations))
+        return hmac.compare_digest(derived.hex(), expected)
+
+    def needs_update(self, stored):
+        return int(stored.split("$")[1]) != self.iterations
+
+
+class ScryptHasher(object):
+    name = "scrypt"
+
+    def __init__(self, config):
+        self.n = config.get("PASSWORD_SCRYPT_N", 2 ** 14)
+        self.r = config.get("PASSWORD_SCRYPT_R", 8)
+        self.p = config.get("PASSWORD_SCRYPT_P", 1)
+
+    def identify(self, stored):
+        return stored.startswith(self.name + "$")
+
+    def derive(self, password, salt, n, r, p):
+        return pool.run(scrypt, password, salt, n, r, p)
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        return "{}${}${}${}${}${}".format(
+            self.name, self.n, self.r, self.p, salt.hex(),
+            self.derive(password, salt, self.n, self.r, self.p).hex()
+        )
+
+    def verify(self, password, stored):
+        _, n, r, p, salt, expected = stored.split("$")
+        derived = self.derive(
+            password, bytes.fromhex(salt), int(n), int(r), int(p)
+        )
+        return hmac.compare_digest(derived.hex(), expected)
+
+    def needs_update(self, stored):
+        params = [str(self.n), str(self.r), str(self.p)]
+        return stored.split("$")[1:4] != params
+
+
+hashers = {
+    hasher.name: hasher
+    for hasher in (SHA256Hasher, PBKDF2Hasher, ScryptHasher)
+}
+
+
+def current():
+    return hashers[app.config.get("PASSWORD_HASHER", "pbkdf2_sha256")](
+        app.config
+    )
+
+
+def hasher_for(stored):
+    for hasher in hashers.values():
+        hasher = hasher(app.config)
+        if hasher.identify(stored):
+            return hasher
+
+
+# passwords that recently verified, keyed by an HMAC of the stored hash and
+# the password under a per process secret so neither is kept in memory
+class CredentialCache(TTLCache):
+
+    def __init__(self, *args, **kwargs):
+        super(CredentialCache, self).__init__(*args, **kwargs)
+        self._secret = os.urandom(32)
+
+    def key(self, stored, password):
+        return hmac.new(
+            self._secret,
+            stored.encode("utf-8") + b"\0" + password.encode("utf-8"),
+            hashlib.sha256
+        ).digest()
+
+
+credentials = CredentialCache(
+    app.config.get("PASSWORD_CACHE_SIZE", 10000),
+    app.config.get("PASSWORD_CACHE_TTL", 300),
+)
+
+
+def hash_password(password):
+    return current().hash(password)
+
+
+# (matches, outdated) where outdated says the password matched a hash made
+# with other than the current settings. Only a caller that stores the
+# replacement pays for hash_password
+def verify_password(password, stored):
+    if not stored or password is None:
+        return False, False
+
+    hasher = hasher_for(stored)
+    if hasher is None:
+        return False, False
+
+    key = credentials.key(stored, password)
+    if not credentials.get(key):
+        if not hasher.verify(password, stored):
+            return False, False
+        credentials.set(key, True)
+
+    target = current()
+    return True, hasher.name != target.name or target.needs_update(stored)
@@ -0,0 +1,110 @@
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import time
+from functools import wraps
+from flask import current_app, request
+from fuze import db
+
+
+# GET /meeting reads from one of READ_REPLICAS, bind names from
+# SQLALCHEMY_BINDS, everything else and every write goes to the primary.
+# Authorization, GET /view and POST /view/token, always reads the primary.
+# A client that wrote gets a cookie and reads from the primary for the next
+# REPLICA_STICKY_SECONDS, keep that longer than the replicas lag behind.
+#
+# With SQLite a replica is a copy of the primary file, refreshed by
+#
+#   python -m fuze.replicas sync [--interval SECONDS]
+
+STICKY_COOKIE = "fuze_primary"
+
+
+def replicas(config):
+    return config.get("READ_REPLICAS") or []
+
+
+def sticky(now=None):
+    now = time.time() if now is None else now
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > now
+    except ValueError:
+        return False
+
+
+def read_replica(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        names = replicas(current_app.config)
+        if names and not sticky():
+            db.session.info["replica"] = random.choice(names)
+        else:
+            db.session.info["replica"] = None
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+
+    # runs after the commit, the next request on this session starts out
+    # on the primary again. Read routes never make a client sticky
+    @app.after_request
+    def stick_to_primary(response):
+        read = "replica" in db.session.info
+        db.session.info.pop("replica", None)
+        if read or not replicas(app.config) or response.status_code >= 400 \
+                or request.method in ("GET", "HEAD", "OPTIONS"):
+            return response
+
+        seconds = app.config.get("REPLICA_STICKY_SECONDS", 5)
+        response.set_cookie(
+            STICKY_COOKIE, "{:.3f}".format(time.time() + seconds),
+            max_age=seconds, httponly=True
+        )
+        return response
+
+
+# SQLite's online backup copies a consistent snapshot of the primary even
+# while it is being written to
+def sync(source, target):
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def sync_all(app):
+    primary = db.get_engine(app).url.database
+    synced = {}
+    for name in replicas(app.config):
+        synced[name] = db.get_engine(app, bind=name).url.database
+        sync(primary, synced[name])
+    return synced
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Copy the primary SQLite file over its read replicas"
+    )
+    parser.add_argument("command", choices=["sync"])
+    parser.add_argument(
+        "--interval", type=float, default=None,
+        help="keep syncing every INTERVAL seconds"
+    )
+    args = parser.parse_args(argv)
+
+    app = db.get_app()
+    while True:
+        print(json.dumps(sync_all(app), sort_keys=True))
+        if args.interval is None:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
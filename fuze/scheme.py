@@ -22,6 +22,19 @@ _user_delete = {
     "required": ["email"]
 }
 
+_users_batch_create = {
+    "type": "object",
+    "properties": {
+        "emails": {
+            "type": "array",
+            "description": "emails of the users you are creating",
+            "items": {"type": "string", "format": "email"},
+            "maxItems": 1000,
+        }
+    },
+    "required": ["emails"]
+}
+
 _meeting_create = {
     "type": "object",
     "properties": {
@@ -71,6 +84,24 @@ _meeting_share = {
     "required": ["meeting_id", "email"]
 }
 
+_meeting_share_batch = {
+    "type": "object",
+    "properties": {
+        "meeting_id": {
+            "type": "number",
+            "description": "id of the meeting you want to share",
+            "minimum": 0,
+        },
+        "emails": {
+            "type": "array",
+            "description": "emails of the users you want to share with",
+            "items": {"type": "string", "format": "email"},
+            "maxItems": 1000,
+        }
+    },
+    "required": ["meeting_id", "emails"]
+}
+
 _meeting_get = {
     "type": "object",
     "properties": {
@@ -105,10 +136,12 @@ _recording_visibility = {
 mapping = {
     "user_create": _user_create,
     "user_delete": _user_delete,
+    "users_batch_create": _users_batch_create,
 
     "meeting_create": _meeting_create,
     "meeting_delete": _meeting_delete,
     "meeting_share": _meeting_share,
+    "meeting_share_batch": _meeting_share_batch,
     "meeting_get": _meeting_get,
 
     "recording_visibility": _recording_visibility
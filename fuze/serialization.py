@@ -0,0 +1,32 @@
+import json
+from fuze import app
+
+try:
+    import orjson
+except ImportError:  # optional, responses fall back to the stdlib encoder
+    orjson = None
+
+
+# every JSON body goes through dumps(), compact and already encoded to
+# bytes. JSON_BACKEND picks "orjson" or "json", None takes orjson when it
+# is installed
+def stdlib_dumps(obj):
+    return json.dumps(
+        obj, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+backends = {"json": stdlib_dumps}
+if orjson is not None:
+    backends["orjson"] = orjson.dumps
+
+
+def backend():
+    name = app.config.get("JSON_BACKEND")
+    if name is None:
+        name = "orjson" if orjson is not None else "json"
+    return backends.get(name, stdlib_dumps)
+
+
+def dumps(obj):
+    return backend()(obj)
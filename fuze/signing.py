@@ -0,0 +1,166 @@
+import base64
+import binascii
+import hmac
+import os
+import shlex
+import sys
+import time
+from collections import namedtuple
+from hashlib import sha256
+from urllib.parse import urlencode
+from fuze import app
+from fuze import errors
+from fuze.cache import view_generations
+
+
+# HMAC signatures for links and tokens that are checked without touching the
+# database. SECRET_KEY has to be the same on every worker, when it isn't set
+# each process signs with its own random key
+class Signer(object):
+
+    def __init__(self):
+        self._random = os.urandom(32)
+
+    def key(self):
+        secret = app.config.get("SECRET_KEY")
+        if not secret:
+            return self._random
+        if isinstance(secret, str):
+            secret = secret.encode("utf-8")
+        return secret
+
+    def sign(self, *parts):
+        message = "\0".join(str(part) for part in parts).encode("utf-8")
+        return hmac.new(self.key(), message, sha256).hexdigest()
+
+    def verify(self, signature, *parts):
+        return hmac.compare_digest(
+            self.sign(*parts).encode("ascii"),
+            signature.encode("utf-8", "replace"),
+        )
+
+
+signer = Signer()
+
+
+# how many worker processes gunicorn or uvicorn was started with, 1 for
+# anything else. Workers are forked or spawned with the server's argv and
+# environment so this works from inside one
+def worker_count(argv=None, environ=None):
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    if not argv or not any(
+        server in argv[0] for server in ("gunicorn", "uvicorn")
+    ):
+        return 1
+
+    count = environ.get("WEB_CONCURRENCY", "1")
+    args = shlex.split(environ.get("GUNICORN_CMD_ARGS", "")) + argv[1:]
+    for i, arg in enumerate(args):
+        if arg in ("-w", "--workers") and i + 1 < len(args):
+            count = args[i + 1]
+        elif arg.startswith("--workers="):
+            count = arg.split("=", 1)[1]
+        elif arg.startswith("-w") and arg[2:].isdigit():
+            count = arg[2:]
+    return int(count) if count.isdigit() else 1
+
+
+# links and tokens signed by one worker have to verify on the others
+def check_secret_key(config, workers=None):
+    workers = worker_count() if workers is None else workers
+    if not config.get("SECRET_KEY") and workers > 1:
+        raise RuntimeError(
+            "SECRET_KEY is not set and {} workers are running, each would "
+            "sign /download links and /view tokens with its own random "
+            "key. Set SECRET_KEY in FUZE_SETTINGS".format(workers)
+        )
+
+
+def download_token(url):
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+# /view hands out links to /download/<token> signed for one viewer. Expiries
+# are rounded up to a multiple of DOWNLOAD_URL_TTL so repeat views get the
+# same link and a cache in front of /download sees hits
+def download_url(url, viewer, now=None):
+    ttl = app.config.get("DOWNLOAD_URL_TTL", 300)
+    now = time.time() if now is None else now
+    expires = (int(now) // ttl + 2) * ttl
+    signature = signer.sign("download", download_token(url), viewer, expires)
+    return "{}?{}".format(url, urlencode([
+        ("viewer", viewer),
+        ("expires", expires),
+        ("signature", signature),
+    ]))
+
+
+# seconds the link stays valid, raises InvalidDownloadUrl otherwise
+def verify_download(token, args, now=None):
+    viewer = args.get("viewer")
+    expires = args.get("expires", "")
+    signature = args.get("signature")
+    if viewer is None or signature is None or not expires.isdigit():
+        raise errors.InvalidDownloadUrl
+
+    remaining = int(expires) - int(time.time() if now is None else now)
+    if remaining <= 0:
+        raise errors.InvalidDownloadUrl
+    if not signer.verify(signature, "download", token, viewer, int(expires)):
+        raise errors.InvalidDownloadUrl
+    return remaining
+
+
+def download_headers(token, remaining):
+    return [
+        ("Cache-Control", "public, max-age={}".format(remaining)),
+        ("ETag", '"{}"'.format(token)),
+    ]
+
+
+ViewGrant = namedtuple("ViewGrant", [
+    "meeting_id", "recording_id", "generation", "expires", "viewer", "url"
+])
+
+
+def bearer_token(header):
+    scheme, _, token = (header or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+# bearer tokens for /view, scoped to one meeting and viewer. They carry
+# everything the redirect needs so checking one is CPU only. generation is
+# the recording's count in view_generations when the token was issued
+def view_token(meeting_id, recording_id, generation, viewer, url, now=None):
+    ttl = app.config.get("VIEW_TOKEN_TTL", 300)
+    expires = int(time.time() if now is None else now) + ttl
+    parts = (meeting_id, recording_id, generation, expires, viewer, url)
+    payload = base64.urlsafe_b64encode(
+        "\0".join(str(part) for part in parts).encode("utf-8")
+    ).rstrip(b"=").decode("ascii")
+    return "{}.{}".format(payload, signer.sign("view", *parts)), ttl
+
+
+# the grant behind a token for meeting_id, raises InvalidViewToken when it
+# is forged, for another meeting, expired or revoked
+def verify_view_token(token, meeting_id, now=None):
+    payload, _, signature = token.rpartition(".")
+    try:
+        parts = base64.urlsafe_b64decode(
+            payload + "=" * (-len(payload) % 4)
+        ).decode("utf-8").split("\0")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise errors.InvalidViewToken
+    if len(parts) != 6 or not signer.verify(signature, "view", *parts):
+        raise errors.InvalidViewToken
+
+    grant = ViewGrant(*[int(part) for part in parts[:4]] + parts[4:])
+    now = time.time() if now is None else now
+    if grant.meeting_id != meeting_id or grant.expires <= now:
+        raise errors.InvalidViewToken
+    if grant.generation < view_generations.get(grant.recording_id):
+        raise errors.InvalidViewToken
+    return grant
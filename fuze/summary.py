@@ -0,0 +1,32 @@
+import argparse
+import json
+import sys
+from fuze import db
+from fuze.models import MeetingSummary
+
+
+# python -m fuze.summary rebuild   refill meeting_summary from the tables
+# python -m fuze.summary check     report missing, stale and orphaned rows
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Rebuild or check the meeting_summary read model"
+    )
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with db.get_app().app_context():
+        db.create_all()
+        if args.command == "rebuild":
+            count = MeetingSummary.rebuild(args.batch)
+            db.session.commit()
+            print(json.dumps({"rebuilt": count}))
+            return 0
+
+        report = MeetingSummary.check(args.batch)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return 1 if any(report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
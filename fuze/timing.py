@@ -0,0 +1,98 @@
+import heapq
+import logging
+import time
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+log = logging.getLogger("fuze.slow")
+
+
+class RequestTiming(object):
+
+    def __init__(self, keep=5):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.keep = keep
+        self._slowest = []
+
+    def record(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        entry = (elapsed, self.queries, statement)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def slowest(self):
+        return [
+            (elapsed, statement)
+            for elapsed, _, statement in sorted(self._slowest, reverse=True)
+        ]
+
+
+def current():
+    if has_app_context():
+        return g.get("timing")
+
+
+# the start goes on the statement's own execution context, a statement
+# that fails never reaches after_cursor_execute and its start goes with it
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    if context is not None:
+        context._fuze_query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    start = getattr(context, "_fuze_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    timing = current()
+    if timing is not None:
+        timing.record(statement, elapsed)
+
+
+def init_app(app):
+
+    @app.before_request
+    def start_timing():
+        g.timing = RequestTiming(app.config.get("SLOW_REQUEST_STATEMENTS", 5))
+
+    @app.after_request
+    def finish_timing(response):
+        timing = current()
+        if timing is None:
+            return response
+
+        elapsed = timing.elapsed
+        response.headers["Server-Timing"] = (
+            'app;dur={:.2f}, db;dur={:.2f};desc="{} queries"'.format(
+                elapsed * 1000, timing.db_time * 1000, timing.queries
+            )
+        )
+
+        threshold = app.config.get("SLOW_REQUEST_MS", 500)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            log.warning(
+                "slow request %s %s %d %.1fms, %d queries %.1fms in db%s",
+                request.method, request.full_path.rstrip("?"),
+                response.status_code, elapsed * 1000, timing.queries,
+                timing.db_time * 1000,
+                "".join(
+                    "\n  {:.1f}ms {}".format(e * 1000, " ".join(s.split()))
+                    for e, s in timing.slowest()
+                )
+            )
+        return response
@@ -0,0 +1,131 @@
+from numbers import Number
+from jsonschema.exceptions import ValidationError
+from jsonschema.validators import validator_for
+from fuze.scheme import mapping
+
+
+# keywords the generated fast path understands, anything else in a schema
+# means it is only checked by the full jsonschema validator
+_KEYWORDS = {"type", "properties", "required", "description", "format"}
+_PROPERTY_KEYWORDS = {
+    "type", "minimum", "enum", "items", "maxItems", "description", "format"
+}
+_ITEM_KEYWORDS = {"type", "description", "format"}
+
+_TYPES = {
+    "object": "isinstance({0}, dict)",
+    "string": "isinstance({0}, str)",
+    "number": "(isinstance({0}, Number) and not isinstance({0}, bool))",
+    "array": "isinstance({0}, list)",
+}
+
+
+def _known_types(schema):
+    types = schema.get("type", [])
+    if not isinstance(types, list):
+        types = [types]
+    return bool(types) and not set(types) - set(_TYPES)
+
+
+def _type_check(types, name):
+    if not isinstance(types, list):
+        types = [types]
+    return " or ".join(_TYPES[t].format(name) for t in types)
+
+
+def _compilable(schema):
+    if set(schema) - _KEYWORDS or schema.get("type") != "object":
+        return False
+
+    for prop in schema.get("properties", {}).values():
+        if set(prop) - _PROPERTY_KEYWORDS or not _known_types(prop):
+            return False
+        items = prop.get("items")
+        if items is not None and (
+            set(items) - _ITEM_KEYWORDS or not _known_types(items)
+        ):
+            return False
+    return True
+
+
+def _generate(schema):
+    lines = [
+        "def check(instance):",
+        "    if not isinstance(instance, dict):",
+        "        return False",
+    ]
+    for key in schema.get("required", []):
+        lines += [
+            "    if {!r} not in instance:".format(key),
+            "        return False",
+        ]
+
+    for key, prop in sorted(schema.get("properties", {}).items()):
+        lines += [
+            "    if {!r} in instance:".format(key),
+            "        value = instance[{!r}]".format(key),
+            "        if not ({}):".format(_type_check(prop["type"], "value")),
+            "            return False",
+        ]
+        if "minimum" in prop:
+            lines += [
+                "        if {} and value < {!r}:".format(
+                    _TYPES["number"].format("value"), prop["minimum"]
+                ),
+                "            return False",
+            ]
+        if "enum" in prop:
+            lines += [
+                "        if value not in {!r}:".format(prop["enum"]),
+                "            return False",
+            ]
+        if "maxItems" in prop:
+            lines += [
+                "        if isinstance(value, list) and len(value) > {!r}:"
+                .format(prop["maxItems"]),
+                "            return False",
+            ]
+        if "items" in prop:
+            lines += [
+                "        if isinstance(value, list):",
+                "            for item in value:",
+                "                if not ({}):".format(
+                    _type_check(prop["items"]["type"], "item")
+                ),
+                "                    return False",
+            ]
+    lines.append("    return True")
+
+    namespace = {"Number": Number}
+    exec("\n".join(lines), namespace)
+    return namespace["check"]
+
+
+class SchemaValidator(object):
+
+    def __init__(self, schema):
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+
+        self.schema = schema
+        self.validator = cls(schema)
+        self.fast = _generate(schema) if _compilable(schema) else None
+
+    def __call__(self, payload):
+        # the fast path only ever answers "definitely valid", a payload it
+        # rejects goes through jsonschema to get the real error message
+        if self.fast is not None and self.fast(payload):
+            return
+        self.validator.validate(payload)
+
+    def is_valid(self, payload):
+        try:
+            self(payload)
+        except ValidationError:
+            return False
+        return True
+
+
+validators = {
+    name: SchemaValidator(schema) for name, schema in mapping.items()
+}
@@ -1,11 +1,25 @@
-from hashlib import sha256
 from functools import wraps
-from flask import request, redirect
-from fuze import errors
-from fuze.models import Meeting, Recording, User, Viewer
-from fuze.scheme import mapping
-from jsonschema import validate
+from flask import (
+    Response, current_app, request, redirect, stream_with_context
+)
+from fuze import db, errors
+from fuze.cache import authorizations, meeting_reads, view_generations
+from fuze.health import readiness
+from fuze.metrics import registry
+from fuze.serialization import dumps
+from fuze.passwords import hash_password, verify_password
+from fuze.replicas import read_replica
+from fuze.models import (
+    Meeting, MeetingSummary, Recording, User, Version, Viewer,
+    meeting_document
+)
+from fuze.signing import (
+    bearer_token, download_headers, download_url, verify_download,
+    verify_view_token, view_token
+)
+from fuze.validation import validators
 from jsonschema.exceptions import ValidationError
+from werkzeug.http import quote_etag
 
 
 PUBLIC = "public"
@@ -16,13 +30,30 @@ def health():
     return {"message": ":D"}, 200
 
 
+def health_live():
+    return {"status": "ok"}, 200
+
+
+def health_ready():
+    report = readiness.check(current_app.config)
+    return report, 200 if report["ready"] else 503
+
+
+def metrics():
+    return Response(
+        registry.render(), mimetype="text/plain; version=0.0.4"
+    )
+
+
 def payload_validation(func):
+    validate = validators[func.__name__]
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         payload = request.get_json(force=True)
 
         try:
-            validate(payload, mapping[func.__name__])
+            validate(payload)
         except ValidationError as e:
             raise errors.SchemaValidationError(e.message)
 
@@ -30,41 +61,82 @@ def payload_validation(func):
     return wrapper
 
 
-def valid_credentials(username, password):
-    meeting_id = request.args.get("meeting_id")
-    if meeting_id.isdigit():
-        meeting_id = int(meeting_id)
-    else:
+# concurrent identical reads in a worker share one database fetch, see
+# SingleFlight. MEETING_COALESCE turns it off. Replica and primary reads
+# are never shared, a client reading its own writes waits on the primary
+def coalesced(key, fn, *args):
+    if not current_app.config.get("MEETING_COALESCE", True):
+        return fn(*args)
+    key += (db.session.info.get("replica"),)
+    return meeting_reads.do(key, fn, *args)
+
+
+def meeting_access(meeting_id):
+    return coalesced(("access", meeting_id), Recording.access, meeting_id)
+
+
+def parse_meeting_id(value):
+    if not value.isdigit():
         raise errors.InvalidMeetingId
+    return int(value)
 
-    meeting = Meeting.get(meeting_id)
-    if not meeting:
+
+def meeting_id_arg():
+    return parse_meeting_id(request.args.get("meeting_id", ""))
+
+
+def valid_credentials(username, password):
+    meeting_id = meeting_id_arg()
+
+    # keyed on the meeting's version, a commit in any worker that touches
+    # the recording, its viewers or the meeting leaves the entry unused
+    version = Meeting.version_of(meeting_id)
+    if version is None:
+        raise errors.InvalidCredentials
+    key = (meeting_id, username, authorizations.digest(password), version)
+    allowed = authorizations.get(key)
+    if allowed is not None:
+        return allowed
+
+    generation = authorizations.generation
+    recording = meeting_access(meeting_id)
+    if not recording:
         raise errors.InvalidCredentials
 
-    pwhash = sha256(password.encode("utf-8")).hexdigest()
-    if meeting.recording.pwhash != pwhash:
-        return False
+    valid, outdated = verify_password(password, recording.pwhash)
+    if valid and outdated:
+        Recording.upgrade_password(
+            recording.id, recording.pwhash, hash_password(password)
+        )
 
-    if not meeting.recording.public:
-        if meeting.recording.owner == username:
-            return True
+    if not valid:
+        allowed = False
+    elif not recording.public:
+        allowed = recording.owner_email == username
     else:
-        for v in meeting.recording.viewers:
-            if v.viewer == username:
-                return True
-        return False
+        allowed = Viewer.exists(recording.id, username)
 
+    authorizations.set(key, allowed, recording.id, generation)
+    return allowed
 
+
+# a bearer token from POST /view/token is checked without the database and
+# hands over the recording url it was issued with, Basic credentials are
+# checked against the database and leave the url to the view
 def authenticate(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
+        token = bearer_token(request.headers.get("Authorization"))
+        if token is not None:
+            grant = verify_view_token(token, meeting_id_arg())
+            return func(grant.meeting_id, grant.viewer, grant.url)
+
         auth = request.authorization
-        step1 = not auth.username or not auth.password
-        step2 = not valid_credentials(auth.username, auth.password)
+        step1 = auth is None or not auth.username or not auth.password
+        step2 = step1 or not valid_credentials(auth.username, auth.password)
         if (step1 or step2):
             raise errors.InvalidCredentials
-        meeting_id = int(request.args.get("meeting_id"))
-        return func(meeting_id)
+        return func(meeting_id_arg(), auth.username, None)
     return wrapper
 
 
@@ -80,12 +152,32 @@ def user_delete(email):
     return {}, 200
 
 
+def conflict(email, error):
+    return {
+        "email": email,
+        "code": error.code,
+        "error": error.__name__,
+        "message": error.description,
+    }
+
+
+@payload_validation
+def users_batch_create(emails):
+    created, existing = User.create_many(emails)
+    return {
+        "created": created,
+        "conflicts": [
+            conflict(email, errors.PreexistingUser) for email in existing
+        ],
+    }, 200
+
+
 @payload_validation
 def meeting_create(host, password=None):
     public = True if password else False
     recording = Recording.create(host, public, password)
     meeting = Meeting.create(host, recording.id)
-    Viewer.add(meeting.host, recording)
+    Viewer.add(host, recording)
     return {
         "meeting_id": meeting.id,
         "recording_url": recording.url,
@@ -105,47 +197,231 @@ def meeting_share(meeting_id, email):
     return {}, 200
 
 
-def meeting_get():
+@payload_validation
+def meeting_share_batch(meeting_id, emails):
+    meeting = Meeting.get(meeting_id)
+    if meeting is None:
+        raise errors.MeetingDoesNotExist
+    shared, conflicts = meeting.recording.share_many(emails, meeting.recording)
+    return {
+        "shared": shared,
+        "conflicts": [conflict(email, error) for email, error in conflicts],
+    }, 200
 
-    def fmt(meeting):
-        return {
-            "meeting": {
-                "id": meeting.id,
-                "host": meeting.host.email
-            },
-            "recording": {
-                "id": meeting.recording.id,
-            },
-            "viewers": list(map(lambda v: v.viewer, meeting.recording.viewers))
-        }
+
+def fmt(meeting):
+    return meeting_document(
+        meeting.id,
+        meeting.host.email,
+        meeting.recording.id,
+        list(map(lambda v: v.viewer, meeting.recording.viewers))
+    )
+
+
+# with MEETING_SUMMARY on meetings are served from their stored documents
+# instead of being joined and formatted on every read
+def summaries():
+    return current_app.config.get("MEETING_SUMMARY", False)
+
+
+def raw_json(body, headers=None):
+    return current_app.response_class(
+        body, mimetype="application/json", headers=headers
+    )
+
+
+# (version, serialized document) of one meeting, or None
+def meeting_body(meeting_id):
+    if summaries():
+        version = Meeting.version_of(meeting_id)
+        document = MeetingSummary.get(meeting_id)
+        if version is None or document is None:
+            return None
+        return version, document.encode("utf-8")
+
+    meeting = Meeting.get(meeting_id, details=True)
+    if meeting is None:
+        return None
+    return meeting.version, dumps(fmt(meeting))
+
+
+def positive_int(value, error):
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise error
+    return int(value)
+
+
+def positive_int_arg(name, error):
+    return positive_int(request.args.get(name), error)
+
+
+def page_limit(limit, config):
+    if limit is None:
+        return None
+    limit = min(limit, config.get("MEETING_PAGE_MAX", 1000))
+    if limit == 0:
+        raise errors.InvalidPagination
+    return limit
+
+
+def meeting_etag(meeting_id, version):
+    return "meeting-{}-{}".format(meeting_id, version)
+
+
+def listing_etag(version):
+    return "meetings-{}".format(version)
+
+
+# a page of stored summary documents, spliced without decoding them
+def summary_page(documents, next_cursor):
+    return '{{"results":[{}],"next_cursor":{}}}'.format(
+        ",".join(documents), dumps(next_cursor).decode("ascii")
+    )
+
+
+def stream_meetings(after):
+    batch = current_app.config.get("MEETING_STREAM_BATCH", 500)
+    # the body is read after the after_request hooks moved the session back
+    # to the primary, keep reading where the ETag came from
+    replica = db.session.info.get("replica")
+
+    def documents():
+        if summaries():
+            for row in MeetingSummary.iterate(after, batch):
+                yield row.document.encode("utf-8")
+        else:
+            for meeting in Meeting.iterate(after, batch):
+                yield dumps(fmt(meeting))
+
+    def generate():
+        if replica is not None:
+            db.session.info["replica"] = replica
+        try:
+            yield b'{"results":['
+            sep = b""
+            for document in documents():
+                yield sep + document
+                sep = b","
+            yield b"]}"
+        finally:
+            db.session.info.pop("replica", None)
+
+    return Response(
+        stream_with_context(generate()), mimetype="application/json"
+    )
+
+
+# If-None-Match compares weakly, compressed responses carry W/ ETags
+def not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={"ETag": quote_etag(etag)})
+
+
+# versions are read before the data they describe, a write landing in
+# between can only make the ETag older than the body, never newer
+@read_replica
+def meeting_get():
     meeting_id = request.args.get("meeting_id", "all")
 
     if meeting_id == "all":
-        meetings = Meeting.get(meeting_id)
-        resp = []
-        for meeting in meetings:
-            resp.append(fmt(meeting))
-        return {"results": resp}, 200
+        etag = listing_etag(Version.current("meetings"))
+        headers = {"ETag": quote_etag(etag)}
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+
+        after = positive_int_arg("after", errors.InvalidPagination)
+        if request.args.get("stream") == "true":
+            response = stream_meetings(after)
+            response.headers.extend(headers)
+            return response
+
+        limit = page_limit(
+            positive_int_arg("limit", errors.InvalidPagination),
+            current_app.config
+        )
+
+        if summaries():
+            rows = MeetingSummary.page(after, limit)
+            next_cursor = None
+            if limit is not None and len(rows) == limit:
+                next_cursor = rows[-1].meeting_id
+            return raw_json(summary_page(
+                [row.document for row in rows], next_cursor
+            ), headers)
+
+        meetings = Meeting.page(after, limit)
+        next_cursor = None
+        if limit is not None and len(meetings) == limit:
+            next_cursor = meetings[-1].id
+        return {
+            "results": list(map(fmt, meetings)),
+            "next_cursor": next_cursor,
+        }, 200, headers
     else:
-        if meeting_id.isdigit():
-            meeting_id = int(meeting_id)
-        else:
-            raise errors.InvalidMeetingId
-        meeting = Meeting.get(meeting_id)
-        return fmt(meeting), 200
+        meeting_id = parse_meeting_id(meeting_id)
 
+        if request.if_none_match:
+            version = Meeting.version_of(meeting_id)
+            if version is not None:
+                unchanged = not_modified(meeting_etag(meeting_id, version))
+                if unchanged is not None:
+                    return unchanged
 
+        found = coalesced(("meeting", meeting_id), meeting_body, meeting_id)
+        if found is None:
+            raise errors.MeetingDoesNotExist
+        version, body = found
+        etag = meeting_etag(meeting_id, version)
+        return raw_json(body, {"ETag": quote_etag(etag)})
+
+
+# authorization is never decided on a replica, a revoked viewer could
+# still pass there and the answer is cached in authorizations
 @authenticate
-def meeting_view(mid):
-    meeting = Meeting.get(mid)
-    resp = redirect(meeting.recording.url, 302)
+def meeting_view(mid, viewer, url=None):
+    if url is None:
+        url = meeting_access(mid).url
+    resp = redirect(download_url(url, viewer), 302)
     resp.data = '{}'
     resp.headers["Content-Type"] = "application/json"
     return resp
 
 
+# exchanges Basic credentials for a bearer token for this meeting. Both
+# are read from the primary and the generation before the credentials, a
+# change that commits in between leaves the token already revoked
+def meeting_view_token():
+    meeting_id = meeting_id_arg()
+    recording = meeting_access(meeting_id)
+    if recording is None:
+        raise errors.InvalidCredentials
+    generation = view_generations.get(recording.id)
+
+    auth = request.authorization
+    if auth is None or not auth.username or not auth.password or \
+            not valid_credentials(auth.username, auth.password):
+        raise errors.InvalidCredentials
+
+    token, expires_in = view_token(
+        meeting_id, recording.id, generation, auth.username, recording.url
+    )
+    return {
+        "token": token,
+        "token_type": "Bearer",
+        "expires_in": expires_in,
+    }, 200, {"Cache-Control": "no-store"}
+
+
+# the signed link is the authorization, checking it needs no database
 def download(recording_id):
-    return {"redirected": "to s3 to get your recording"}, 200
+    remaining = verify_download(recording_id, request.args)
+    headers = download_headers(recording_id, remaining)
+    if request.if_none_match.contains_weak(recording_id):
+        return Response(status=304, headers=headers)
+    return {"redirected": "to s3 to get your recording"}, 200, headers
 
 
 @payload_validation
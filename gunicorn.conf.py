@@ -0,0 +1,9 @@
+# gunicorn -c gunicorn.conf.py run:app
+
+
+def on_starting(server):
+    # the master starts every server's /metrics from zero, workers only
+    # ever add their own file
+    from fuze import db
+    from fuze.metrics import clear_directory
+    clear_directory(db.get_app().config.get("METRICS_DIR"))
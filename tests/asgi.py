@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from fuze.asgi import AsyncApp
+except ImportError:  # requirements-async.txt isn't installed
+    AsyncApp = None
+from fuze.passwords import hash_password
+from fuze.models import Meeting, MeetingSummary, Recording, User, Viewer
+from fuze.summary import main
+from tests.base import DatabaseMixin, HelperMixin
+
+
+@unittest.skipIf(AsyncApp is None, "aiosqlite not installed")
+class AsgiTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.database_uri = "sqlite:///" + os.path.join(self.tmp, "fuze.db")
+        super(AsgiTests, self).setUp()
+        self.asgi = AsyncApp(self.app.application)
+
+        self.db.session.add(User(email="test@foo.com"))
+        self.db.session.add(User(email="viewer@foo.com"))
+        for public in (True, False):
+            recording = Recording(
+                owner_email="test@foo.com", url="http://s3/test",
+                public=public, pwhash=hash_password("secret"),
+            )
+            self.db.session.add(recording)
+            self.db.session.flush()
+            self.db.session.add(Meeting(
+                host_email="test@foo.com", recording_id=recording.id
+            ))
+            self.db.session.add(Viewer(
+                viewer="viewer@foo.com", recording_id=recording.id
+            ))
+        self.db.session.commit()
+        self.db.session.remove()
+
+    def tearDown(self):
+        engine = self.db.engine
+        asyncio.run(self.asgi.db.close())
+        self.asgi.executor.shutdown()
+        super(AsgiTests, self).tearDown()
+        engine.dispose()
+        shutil.rmtree(self.tmp)
+
+    def request(self, method, path, qs="", data=None, headers=()):
+        body = json.dumps(data).encode("utf-8") if data else b""
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": method,
+            "path": path,
+            "query_string": qs.encode("ascii"),
+            "headers": [
+                (k.lower().encode("latin-1"), v.encode("latin-1"))
+                for k, v in headers
+            ],
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": body}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            # the connection pool belongs to the loop that created it
+            await self.asgi(scope, receive, send)
+            await self.asgi.db.close()
+
+        asyncio.run(run())
+        start = messages[0]
+        data = b"".join(m.get("body", b"") for m in messages[1:])
+        self.assertFalse(messages[-1].get("more_body", False))
+        headers = {
+            k.decode("latin-1").lower(): v.decode("latin-1")
+            for k, v in start["headers"]
+        }
+        return json.loads(data.decode("utf-8")), start["status"], headers
+
+    def basic(self, username, password):
+        token = "{}:{}".format(username, password).encode("utf-8")
+        return [("Authorization", "Basic " + base64.b64encode(token).decode())]
+
+    def view(self, meeting_id, headers=()):
+        return self.request(
+            "GET", "/view", "meeting_id={}".format(meeting_id), headers=headers
+        )
+
+    def test_health(self):
+        resp, code, headers = self.request("GET", "/health")
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp, {"message": ":D"})
+
+    def test_meeting_list_matches_sync(self):
+        for qs in ("meeting_id=all", "meeting_id=all&limit=1",
+                   "meeting_id=all&limit=1&after=1", "meeting_id=1"):
+            expected, code, etag = self.call("get", "/meeting?" + qs)
+            self.assertEqual(code, 200, expected)
+            resp, code, headers = self.request("GET", "/meeting", qs)
+            self.assertEqual(code, 200, resp)
+            self.assertEqual(resp, expected)
+            self.assertEqual(headers["etag"], etag["ETag"])
+
+    def test_meeting_list_stream(self):
+        self.app.application.config["MEETING_STREAM_BATCH"] = 1
+        try:
+            expected, code, _ = self.call(
+                "get", "/meeting?meeting_id=all&stream=true"
+            )
+            resp, code, _ = self.request(
+                "GET", "/meeting", "meeting_id=all&stream=true"
+            )
+        finally:
+            self.app.application.config["MEETING_STREAM_BATCH"] = 500
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(resp["results"]), 2)
+        self.assertEqual(resp, expected)
+
+    def test_meeting_summary(self):
+        self.assertEqual(main(["rebuild"]), 0)
+        # a document only the summary table has, both apps must serve it
+        MeetingSummary.query.filter_by(meeting_id=1).update({
+            "document": '{"meeting":{"id":1},"stored":true}'
+        })
+        self.db.session.commit()
+
+        config = self.app.application.config
+        config["MEETING_SUMMARY"] = True
+        try:
+            for qs in ("meeting_id=all", "meeting_id=all&limit=1",
+                       "meeting_id=all&stream=true", "meeting_id=1"):
+                expected, code, etag = self.call("get", "/meeting?" + qs)
+                self.assertEqual(code, 200, expected)
+                resp, code, headers = self.request("GET", "/meeting", qs)
+                self.assertEqual(code, 200, resp)
+                self.assertEqual(resp, expected)
+                self.assertEqual(headers["etag"], etag["ETag"])
+        finally:
+            config["MEETING_SUMMARY"] = False
+        self.assertEqual(resp, {"meeting": {"id": 1}, "stored": True})
+
+    def test_meeting_get_errors(self):
+        resp, code, _ = self.request("GET", "/meeting", "meeting_id=99")
+        self.assertEqual(code, 404, resp)
+        resp, code, _ = self.request("GET", "/meeting", "meeting_id=abc")
+        self.assertEqual(code, 400, resp)
+        resp, code, _ = self.request("GET", "/meeting", "limit=0")
+        self.assertEqual(code, 400, resp)
+
+    def test_meeting_view(self):
+        headers = self.basic("viewer@foo.com", "secret")
+        resp, code, h = self.view(1, headers)
+        self.assertEqual(code, 302, resp)
+        self.assertTrue(h["location"].startswith("http://s3/test?viewer="))
+        self.assertEqual(resp, {})
+
+        # private recordings are only for their owner
+        resp, code, h = self.view(2, headers)
+        self.assertEqual(code, 401, resp)
+        owner = self.basic("test@foo.com", "secret")
+        resp, code, h = self.view(2, owner)
+        self.assertEqual(code, 302, resp)
+
+        wrong = self.basic("viewer@foo.com", "wrong")
+        resp, code, h = self.view(1, wrong)
+        self.assertEqual(code, 401, resp)
+        resp, code, h = self.request("GET", "/view", "meeting_id=1")
+        self.assertEqual(code, 401, resp)
+
+    def test_meeting_view_bearer(self):
+        resp, code, _ = self.request(
+            "POST", "/view/token", "meeting_id=1",
+            headers=self.basic("viewer@foo.com", "secret")
+        )
+        self.assertEqual(code, 200, resp)
+        bearer = [("Authorization", "Bearer " + resp["token"])]
+
+        resp, code, h = self.view(1, bearer)
+        self.assertEqual(code, 302, resp)
+        self.assertTrue(h["location"].startswith("http://s3/test?viewer="))
+        resp, code, h = self.view(2, bearer)
+        self.assertEqual(code, 401, resp)
+
+    def test_wsgi_fallback(self):
+        resp, code, _ = self.request(
+            "POST", "/user", data={"email": "new@foo.com"},
+            headers=[("Content-Type", "application/json")],
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertIsNotNone(User.query.get("new@foo.com"))
+
+        resp, code, _ = self.request(
+            "POST", "/user", data={"email": "new@foo.com"},
+            headers=[("Content-Type", "application/json")],
+        )
+        self.assertEqual(code, 409, resp)
+
+    def test_download(self):
+        headers = self.basic("viewer@foo.com", "secret")
+        resp, code, h = self.view(1, headers)
+        qs = h["location"].split("?", 1)[1]
+
+        resp, code, h = self.request("GET", "/download/test", qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(h["etag"], '"test"')
+
+        resp, code, h = self.request("GET", "/download/other", qs)
+        self.assertEqual(code, 403, resp)
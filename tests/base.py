@@ -1,13 +1,21 @@
 import unittest
 import json
+from contextlib import contextmanager
+
+from sqlalchemy import event
 
 from fuze import app, db
 from fuze.app import configure
+from fuze.cache import authorizations, meeting_reads, view_generations
+from fuze.health import readiness
+from fuze.metrics import registry
+from fuze.passwords import credentials
 
 configure(app, db)
 
 
 class DatabaseMixin(unittest.TestCase):
+    database_uri = "sqlite:///"
 
     def setUp(self):
 
@@ -17,12 +25,22 @@ class DatabaseMixin(unittest.TestCase):
         self.app = app.test_client()
         self.app.application.config["TESTING"] = True
         self.app.application.config["SQLALCHEMY_ECHO"] = False
-        self.app.application.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///"
+        self.app.application.config["METRICS_DIR"] = None
+        self.app.application.config["SQLALCHEMY_DATABASE_URI"] = (
+            self.database_uri
+        )
 
         self.db = db
         self.db.drop_all()
         self.db.create_all()
 
+        authorizations.clear()
+        meeting_reads.clear()
+        view_generations.clear()
+        credentials.clear()
+        registry.clear()
+        readiness.cache.clear()
+
     def tearDown(self):
         self.db.session.remove()
         self.db.drop_all()
@@ -50,3 +68,19 @@ class HelperMixin(unittest.TestCase):
             query_string=qs,
         )
         return json.loads(resp.data.decode("ascii")), resp.status_code, resp.headers
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = self.db.engine
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                engine, "before_cursor_execute", before_cursor_execute
+            )
@@ -0,0 +1,167 @@
+import threading
+import unittest
+
+from fuze.cache import AuthorizationCache, SingleFlight, TTLCache
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTests(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 1, "size": 2})
+
+    def test_expiry(self):
+        clock = Clock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 10
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class AuthorizationCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AuthorizationCache(size=3)
+        self.digest = self.cache.digest("secret")
+
+    def test_digest_is_keyed(self):
+        self.assertNotEqual(self.digest, self.cache.digest("other"))
+        self.assertNotEqual(self.digest, AuthorizationCache().digest("secret"))
+
+    def test_invalidate_by_recording(self):
+        self.cache.set((1, "a@foo.com", self.digest), True, 10)
+        self.cache.set((2, "a@foo.com", self.digest), True, 20)
+
+        self.cache.invalidate(recordings=[10])
+        self.assertIsNone(self.cache.get((1, "a@foo.com", self.digest)))
+        self.assertTrue(self.cache.get((2, "a@foo.com", self.digest)))
+
+    def test_invalidate_by_user(self):
+        self.cache.set((1, "a@foo.com", self.digest), True, 10)
+        self.cache.set((1, "b@foo.com", self.digest), False, 10)
+
+        self.cache.invalidate(users=["a@foo.com"])
+        self.assertIsNone(self.cache.get((1, "a@foo.com", self.digest)))
+        self.assertFalse(self.cache.get((1, "b@foo.com", self.digest)))
+
+    def test_stale_generation_not_stored(self):
+        generation = self.cache.generation
+        self.cache.invalidate(recordings=[10])
+        self.cache.set((1, "a@foo.com", self.digest), True, 10, generation)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_eviction_cleans_indexes(self):
+        for mid in range(5):
+            self.cache.set((mid, "a@foo.com", self.digest), True, mid)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(set(self.cache._recordings), {2, 3, 4})
+        self.assertEqual(len(self.cache._users["a@foo.com"]), 3)
+
+
+class SingleFlightTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.flight = SingleFlight(ttl=1, clock=self.clock)
+        self.calls = []
+
+    def fetch(self, value):
+        self.calls.append(value)
+        return value
+
+    def herd(self, size, fn):
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return fn()
+
+        def run():
+            results.append(self.flight.do("key", slow))
+
+        leader = threading.Thread(target=run)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=run) for _ in range(size - 1)]
+        for thread in followers:
+            thread.start()
+        # every follower is waiting on the leader's call before it returns
+        while self.flight.coalesced < size - 1:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        return results
+
+    def test_concurrent_calls_share_one_fetch(self):
+        results = self.herd(20, lambda: self.fetch("value"))
+        self.assertEqual(results, ["value"] * 20)
+        self.assertEqual(self.calls, ["value"])
+        self.assertEqual(
+            self.flight.stats(), {"fetches": 1, "coalesced": 19, "hits": 0}
+        )
+
+    def test_result_kept_for_ttl(self):
+        self.assertEqual(self.flight.do("key", self.fetch, 1), 1)
+        self.clock.now = 1
+        self.assertEqual(self.flight.do("key", self.fetch, 2), 1)
+        self.clock.now = 2
+        self.assertEqual(self.flight.do("key", self.fetch, 3), 3)
+        self.assertEqual(self.calls, [1, 3])
+        self.assertEqual(self.flight.stats()["hits"], 1)
+
+    def test_invalidate_drops_results(self):
+        self.flight.do("key", self.fetch, 1)
+        self.flight.invalidate()
+        self.assertEqual(self.flight.do("key", self.fetch, 2), 2)
+
+    def test_stale_call_not_joined_or_stored(self):
+        def invalidated():
+            # a write commits while the fetch is running
+            self.flight.invalidate()
+            return self.flight.do("key", self.fetch, "new")
+
+        self.assertEqual(self.flight.do("key", invalidated), "new")
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual(self.flight.do("key", self.fetch, "other"), "new")
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        def fail():
+            raise ValueError("boom")
+
+        errors = []
+        original = self.flight.do
+
+        def do(key, fn, *args):
+            try:
+                return original(key, fn, *args)
+            except ValueError as e:
+                errors.append(e)
+
+        self.flight.do = do
+        self.assertEqual(self.herd(5, fail), [None] * 5)
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(self.flight.do("key", self.fetch, 1), 1)
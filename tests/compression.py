@@ -0,0 +1,94 @@
+import gzip
+import json
+import unittest
+import zlib
+
+from fuze import compression
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class CompressionTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        super(CompressionTests, self).setUp()
+        emails = ["viewer{}@foo.com".format(i) for i in range(20)]
+        resp = self.app.post("/users:batch", data=json.dumps({
+            "emails": emails + ["test@foo.com"]
+        }))
+        self.assertEqual(resp.status_code, 200)
+        for _ in range(10):
+            resp = self.app.post("/meeting", data=json.dumps({
+                "host": "test@foo.com"
+            }))
+            meeting_id = json.loads(resp.data.decode("utf-8"))["meeting_id"]
+            self.app.put("/meeting/viewers:batch", data=json.dumps({
+                "meeting_id": meeting_id, "emails": emails
+            }))
+        self.plain = self.app.get("/meeting").data
+
+    def tearDown(self):
+        self.app.application.config["COMPRESS_STREAM_FLUSH"] = 64 * 1024
+        super(CompressionTests, self).tearDown()
+
+    def get(self, encoding, **qs):
+        return self.app.get("/meeting", query_string=qs, headers={
+            "Accept-Encoding": encoding
+        })
+
+    def test_small_responses_skip(self):
+        resp = self.app.get("/health", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertEqual(resp.headers["Vary"], "Accept-Encoding")
+
+    def test_identity(self):
+        resp = self.app.get("/meeting")
+        self.assertNotIn("Content-Encoding", resp.headers)
+        resp = self.get("gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", resp.headers)
+
+    def test_negotiation(self):
+        decoders = {
+            "gzip": gzip.decompress,
+            "deflate": zlib.decompress,
+        }
+        if compression.brotli is not None:
+            decoders["br"] = compression.brotli.decompress
+
+        for encoding, decode in decoders.items():
+            resp = self.get("{}, identity;q=0.5".format(encoding))
+            self.assertEqual(resp.headers["Content-Encoding"], encoding)
+            self.assertLess(len(resp.data), len(self.plain) / 3)
+            self.assertEqual(
+                int(resp.headers["Content-Length"]), len(resp.data)
+            )
+            self.assertEqual(decode(resp.data), self.plain)
+
+    @unittest.skipIf(compression.brotli is None, "brotli not installed")
+    def test_prefers_brotli(self):
+        resp = self.get("gzip, deflate, br")
+        self.assertEqual(resp.headers["Content-Encoding"], "br")
+
+    def test_stream(self):
+        self.app.application.config["COMPRESS_STREAM_FLUSH"] = 256
+        plain = self.app.get("/meeting", query_string={"stream": "true"}).data
+
+        resp = self.app.get(
+            "/meeting", query_string={"stream": "true"},
+            headers={"Accept-Encoding": "gzip"}, buffered=False
+        )
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", resp.headers)
+        chunks = list(resp.response)
+        resp.close()
+        self.assertGreater(len([c for c in chunks if c]), 3)
+        self.assertEqual(gzip.decompress(b"".join(chunks)), plain)
+
+    def test_etag_weak(self):
+        resp = self.get("gzip")
+        etag = resp.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        resp = self.app.get("/meeting", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": etag
+        })
+        self.assertEqual(resp.status_code, 304)
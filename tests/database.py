@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from fuze.migrate import migrate
+from fuze.models import User, Viewer
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class SqliteProdTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.database_uri = "sqlite:///" + os.path.join(self.tmp, "fuze.db")
+        super(SqliteProdTests, self).setUp()
+        self.assertEqual(
+            self.app.application.config["SQLITE_MODE"], "sqlite-prod"
+        )
+
+    def tearDown(self):
+        engine = self.db.engine
+        super(SqliteProdTests, self).tearDown()
+        engine.dispose()
+        shutil.rmtree(self.tmp)
+
+    def test_pragmas(self):
+        pragma = self.db.session.execute
+        self.assertEqual(pragma("PRAGMA journal_mode").scalar(), "wal")
+        self.assertEqual(pragma("PRAGMA synchronous").scalar(), 1)
+        self.assertEqual(pragma("PRAGMA foreign_keys").scalar(), 1)
+        self.assertEqual(pragma("PRAGMA busy_timeout").scalar(), 5000)
+        self.assertEqual(self.db.engine.pool.size(), 5)
+
+    def test_concurrent_reads_and_writes(self):
+        failures = []
+
+        def writer(n):
+            client = self.app.application.test_client()
+            for i in range(25):
+                resp = client.post("/user", data=json.dumps({
+                    "email": "writer{}-{}@foo.com".format(n, i)
+                }))
+                if resp.status_code != 200:
+                    failures.append(resp.data)
+                resp = client.post("/meeting", data=json.dumps({
+                    "host": "writer{}-{}@foo.com".format(n, i)
+                }))
+                if resp.status_code != 200:
+                    failures.append(resp.data)
+
+        def reader():
+            client = self.app.application.test_client()
+            for _ in range(50):
+                resp = client.get(
+                    "/meeting", query_string={"meeting_id": "all", "limit": 50}
+                )
+                if resp.status_code != 200:
+                    failures.append(resp.data)
+
+        threads = [
+            threading.Thread(target=writer, args=(n,)) for n in range(4)
+        ]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.db.session.remove()
+        self.assertEqual(self.db.session.query(User).count(), 100)
+
+
+class MigrationTests(DatabaseMixin, HelperMixin):
+
+    # the schema fuze.db shipped with before cascades, versions and summaries
+    LEGACY = [
+        "CREATE TABLE user (email TEXT NOT NULL, PRIMARY KEY (email), "
+        "UNIQUE (email))",
+        "CREATE TABLE recording (id INTEGER NOT NULL, url TEXT NOT NULL, "
+        "owner_email TEXT, public BOOLEAN, pwhash TEXT, PRIMARY KEY (id), "
+        "FOREIGN KEY(owner_email) REFERENCES user (email), "
+        "CHECK (public IN (0, 1)))",
+        "CREATE TABLE meeting (id INTEGER NOT NULL, host_email TEXT, "
+        "recording_id INTEGER, PRIMARY KEY (id), "
+        "FOREIGN KEY(host_email) REFERENCES user (email), "
+        "FOREIGN KEY(recording_id) REFERENCES recording (id))",
+        "CREATE TABLE viewer (id INTEGER NOT NULL, viewer TEXT, "
+        "recording_id INTEGER, PRIMARY KEY (id), "
+        "FOREIGN KEY(viewer) REFERENCES user (email), "
+        "FOREIGN KEY(recording_id) REFERENCES recording (id))",
+        "INSERT INTO user VALUES ('a@foo.com'), ('b@foo.com')",
+        "INSERT INTO recording VALUES (1, 'download/1', 'a@foo.com', 0, NULL)",
+        "INSERT INTO meeting VALUES (1, 'a@foo.com', 1)",
+        "INSERT INTO viewer VALUES (1, 'a@foo.com', 1), (2, 'b@foo.com', 1)",
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.database_uri = "sqlite:///" + os.path.join(self.tmp, "fuze.db")
+        super(MigrationTests, self).setUp()
+        self.db.session.remove()
+        self.db.drop_all()
+        with self.db.engine.begin() as conn:
+            for statement in self.LEGACY:
+                conn.execute(statement)
+
+    def tearDown(self):
+        engine = self.db.engine
+        super(MigrationTests, self).tearDown()
+        engine.dispose()
+        shutil.rmtree(self.tmp)
+
+    def test_migrate_duplicate_viewers(self):
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                "INSERT INTO viewer VALUES (3, 'b@foo.com', 1), "
+                "(4, 'a@foo.com', 1), (5, 'b@foo.com', 1), (6, NULL, 1), "
+                "(7, NULL, 1)"
+            )
+        done = migrate(self.db.engine)
+        self.assertIn("drop 3 duplicate viewer", done)
+        self.assertIn("index ix_viewer_recording_id_viewer", done)
+
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, viewer FROM viewer ORDER BY id"
+            ).fetchall()
+        self.assertEqual(
+            rows, [(1, "a@foo.com"), (2, "b@foo.com"), (6, None), (7, None)]
+        )
+
+    def test_migrate_legacy_database(self):
+        self.assertEqual(
+            sorted(migrate(self.db.engine, dry_run=True)),
+            ["create meeting_summary", "create version", "rebuild meeting",
+             "rebuild recording", "rebuild viewer"]
+        )
+        done = migrate(self.db.engine)
+        self.assertIn("index ix_viewer_recording_id_viewer", done)
+        self.assertEqual(migrate(self.db.engine), [])
+
+        with self.db.engine.connect() as conn:
+            actions = {
+                row[3]: row[6]
+                for row in conn.execute("PRAGMA foreign_key_list(viewer)")
+            }
+        self.assertEqual(
+            actions, {"viewer": "CASCADE", "recording_id": "CASCADE"}
+        )
+
+        resp, code, headers = self.call(
+            "get", "/meeting", qs={"meeting_id": 1}
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp["viewers"], ["a@foo.com", "b@foo.com"])
+        self.assertEqual(headers["ETag"], '"meeting-1-1"')
+
+        resp, code, _ = self.call("delete", "/meeting", data={"meeting_id": 1})
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(self.db.session.query(Viewer).count(), 0)
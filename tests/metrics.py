@@ -0,0 +1,99 @@
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from fuze.metrics import registry
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class MetricsTests(DatabaseMixin, HelperMixin):
+
+    def scrape(self):
+        resp = self.app.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        return resp.data.decode("utf-8")
+
+    def test_request_and_error_metrics(self):
+        data = {"email": "test@foo.com"}
+        self.call("post", "/user", data=data)
+        self.call("post", "/user", data=data)
+        self.call("get", "/meeting", qs={"meeting_id": "nope"})
+
+        text = self.scrape()
+        self.assertIn(
+            'fuze_http_requests_total{method="POST",route="/user",'
+            'status="200"} 1', text
+        )
+        self.assertIn(
+            'fuze_http_requests_total{method="POST",route="/user",'
+            'status="409"} 1', text
+        )
+        for error in ("PreexistingUser", "InvalidMeetingId"):
+            self.assertIn(
+                'fuze_http_errors_total{{error="{}"}} 1'.format(error), text
+            )
+        self.assertIn(
+            'fuze_http_request_duration_seconds_count{method="POST",'
+            'route="/user"} 2', text
+        )
+        self.assertIn(
+            'fuze_http_request_duration_seconds_bucket{method="POST",'
+            'route="/user",le="+Inf"} 2', text
+        )
+        self.assertIn(
+            'fuze_db_queries_total{method="POST",route="/user"} 2', text
+        )
+        self.assertIn("# TYPE fuze_auth_cache_hits gauge", text)
+
+    def test_merges_worker_files(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.app.application.config["METRICS_DIR"] = tmp
+
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        directory = registry.directory()
+        self.assertEqual(directory, tmp)
+        path = os.path.join(directory, "{}.json".format(dead.pid))
+        with open(path, "w") as f:
+            json.dump({
+                "pid": dead.pid,
+                "counters": [[
+                    "fuze_http_requests_total",
+                    [
+                        ["method", "GET"], ["route", "/health"],
+                        ["status", "200"]
+                    ],
+                    5
+                ]],
+                "histograms": [],
+                "gauges": [["fuze_auth_cache_size", [], 100]],
+            }, f)
+
+        self.call("get", "/health")
+        text = self.scrape()
+        self.assertIn(
+            'fuze_http_requests_total{method="GET",route="/health",'
+            'status="200"} 6', text
+        )
+        self.assertIn("fuze_auth_cache_size 0", text)
+        self.assertTrue(os.path.exists(
+            os.path.join(directory, "{}.json".format(os.getpid()))
+        ))
+
+    def test_master_clears_directory(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.app.application.config["METRICS_DIR"] = tmp
+        for name in ("1.json", "2.json.tmp", "notes.txt"):
+            open(os.path.join(tmp, name), "w").close()
+
+        conf = runpy.run_path(
+            os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+        )
+        conf["on_starting"](None)
+        self.assertEqual(os.listdir(tmp), ["notes.txt"])
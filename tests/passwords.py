@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from unittest import mock
+
+from tests.base import app
+from fuze import errors
+from fuze.passwords import (
+    PBKDF2Hasher, credentials, hash_password, pbkdf2, pool, verify_password
+)
+
+
+class PasswordTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = dict(app.config)
+        self.addCleanup(app.config.update, self.config)
+        app.config["PASSWORD_PBKDF2_ITERATIONS"] = 1000
+        app.config["PASSWORD_SCRYPT_N"] = 2 ** 8
+        credentials.clear()
+
+    def test_pbkdf2_roundtrip(self):
+        stored = hash_password("secret")
+        self.assertTrue(stored.startswith("pbkdf2_sha256$1000$"))
+        self.assertNotEqual(stored, hash_password("secret"))
+        self.assertEqual(verify_password("secret", stored), (True, False))
+        self.assertEqual(verify_password("wrong", stored), (False, False))
+
+    def test_scrypt_roundtrip(self):
+        app.config["PASSWORD_HASHER"] = "scrypt"
+        stored = hash_password("secret")
+        self.assertTrue(stored.startswith("scrypt$256$8$1$"))
+        self.assertEqual(verify_password("secret", stored), (True, False))
+        self.assertEqual(verify_password("wrong", stored), (False, False))
+
+    def test_legacy_sha256_is_upgraded(self):
+        stored = sha256("secret".encode("utf-8")).hexdigest()
+        self.assertEqual(verify_password("secret", stored), (True, True))
+        upgraded = hash_password("secret")
+        self.assertTrue(upgraded.startswith("pbkdf2_sha256$1000$"))
+        self.assertEqual(verify_password("secret", upgraded), (True, False))
+        self.assertEqual(verify_password("wrong", stored), (False, False))
+
+    def test_new_work_factor_is_upgraded(self):
+        stored = hash_password("secret")
+        app.config["PASSWORD_PBKDF2_ITERATIONS"] = 2000
+        self.assertEqual(verify_password("secret", stored), (True, True))
+        self.assertTrue(
+            hash_password("secret").startswith("pbkdf2_sha256$2000$")
+        )
+
+    def test_hasher_change_is_upgraded(self):
+        stored = hash_password("secret")
+        app.config["PASSWORD_HASHER"] = "scrypt"
+        self.assertEqual(verify_password("secret", stored), (True, True))
+        self.assertTrue(hash_password("secret").startswith("scrypt$"))
+
+    def test_missing_or_unknown(self):
+        self.assertEqual(verify_password("secret", None), (False, False))
+        self.assertEqual(verify_password("secret", "md5$abc"), (False, False))
+
+    def test_verified_credentials_are_cached(self):
+        stored = hash_password("secret")
+        verify_password("secret", stored)
+        verify_password("wrong", stored)
+
+        calls = []
+        verify = PBKDF2Hasher.verify
+        PBKDF2Hasher.verify = lambda *args: calls.append(1) or verify(*args)
+        self.addCleanup(setattr, PBKDF2Hasher, "verify", verify)
+
+        self.assertEqual(verify_password("secret", stored), (True, False))
+        self.assertEqual(verify_password("wrong", stored), (False, False))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(credentials), 1)
+
+
+class HashPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = dict(app.config)
+        self.addCleanup(pool.configure)
+        self.addCleanup(app.config.update, self.config)
+
+    def use(self, kind, workers, queue):
+        app.config["PASSWORD_POOL"] = kind
+        app.config["PASSWORD_POOL_WORKERS"] = workers
+        app.config["PASSWORD_POOL_QUEUE"] = queue
+        pool.configure()
+
+    def test_saturated_pool_rejects(self):
+        self.use("thread", 1, 1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        busy = [
+            threading.Thread(target=pool.run, args=(release.wait,))
+            for _ in range(2)
+        ]
+        for thread in busy:
+            thread.start()
+        while pool.slots._value:
+            time.sleep(0.001)
+
+        with self.assertRaises(errors.HashingBusy):
+            pool.run(pbkdf2, "secret", b"salt", 1)
+
+        release.set()
+        for thread in busy:
+            thread.join()
+        self.assertEqual(len(pool.run(pbkdf2, "secret", b"salt", 1)), 32)
+
+    def test_process_pool(self):
+        self.use("process", 1, 0)
+        app.config["PASSWORD_PBKDF2_ITERATIONS"] = 1000
+        credentials.clear()
+        stored = hash_password("secret")
+        self.assertEqual(verify_password("secret", stored), (True, False))
+
+    def test_inline(self):
+        self.use(None, 1, 0)
+        self.assertIsNone(pool.executor)
+        self.assertEqual(len(pool.run(pbkdf2, "secret", b"salt", 1)), 32)
+
+    def test_throughput_scales_with_workers(self):
+        # a KDF that takes 50ms and, like hashlib's, releases the GIL
+        def kdf(password, salt, iterations):
+            time.sleep(0.05)
+            return bytes(32)
+
+        patcher = mock.patch("fuze.passwords.pbkdf2", side_effect=kdf)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def throughput(workers):
+            self.use("thread", workers, 64)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(8) as clients:
+                list(clients.map(lambda _: hash_password("secret"), range(8)))
+            return 8 / (time.perf_counter() - start)
+
+        single = throughput(1)
+        several = throughput(4)
+        self.assertLess(single, 8 / 0.4 * 1.05)
+        self.assertGreater(several, single * 2.5)
@@ -0,0 +1,192 @@
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from hashlib import sha256
+
+from fuze.cache import meeting_reads
+from fuze.models import Meeting, Recording, User, Viewer
+from fuze.passwords import hash_password
+from fuze.replicas import STICKY_COOKIE, main
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class ReplicaTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.database_uri = "sqlite:///" + os.path.join(self.tmp, "fuze.db")
+        self.replica = os.path.join(self.tmp, "replica.db")
+        super(ReplicaTests, self).setUp()
+
+        config = self.app.application.config
+        config["SQLALCHEMY_BINDS"] = {"replica": "sqlite:///" + self.replica}
+        config["READ_REPLICAS"] = ["replica"]
+
+        self.db.session.add(User(email="test@foo.com"))
+        self.db.session.commit()
+        self.sync()
+
+    def tearDown(self):
+        config = self.app.application.config
+        self.db.session.remove()
+        self.db.get_engine(self.app.application, bind="replica").dispose()
+        config["SQLALCHEMY_BINDS"] = None
+        config["READ_REPLICAS"] = []
+        engine = self.db.engine
+        super(ReplicaTests, self).tearDown()
+        engine.dispose()
+        shutil.rmtree(self.tmp)
+
+    def sync(self):
+        self.assertEqual(main(["sync"]), 0)
+        meeting_reads.clear()
+
+    def get(self, client, path, **kwargs):
+        resp = client.get(path, query_string={"meeting_id": 1}, **kwargs)
+        return resp.status_code
+
+    def replica_rows(self, sql):
+        conn = sqlite3.connect(self.replica)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_reads_go_to_replica(self):
+        resp, code, headers = self.call("post", "/meeting", data={
+            "host": "test@foo.com", "password": "pw"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(self.replica_rows("SELECT id FROM meeting"), [])
+
+        # the writer reads its own write from the primary, anybody else
+        # reads the replica until it is synced
+        self.assertEqual(self.get(self.app, "/meeting"), 200)
+        other = self.app.application.test_client()
+        self.assertEqual(self.get(other, "/meeting"), 404)
+
+        self.sync()
+        self.assertEqual(self.get(other, "/meeting"), 200)
+
+    def test_stream_reads_replica(self):
+        self.db.session.add(Recording(owner_email="test@foo.com", url="test"))
+        self.db.session.add(Meeting(host_email="test@foo.com", recording_id=1))
+        self.db.session.commit()
+
+        # the body comes from the same copy as the ETag, the unsynced
+        # replica has neither the meeting nor its version bump
+        client = self.app.application.test_client()
+        resp = client.get("/meeting", query_string={
+            "meeting_id": "all", "stream": "true"
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.data.decode("utf-8")), {
+            "results": []
+        })
+        self.assertEqual(resp.headers["ETag"], '"meetings-0"')
+
+        self.sync()
+        resp = client.get("/meeting", query_string={
+            "meeting_id": "all", "stream": "true"
+        })
+        results = json.loads(resp.data.decode("utf-8"))["results"]
+        self.assertEqual([r["meeting"]["id"] for r in results], [1])
+
+    def test_sticky_window_expires(self):
+        resp, code, headers = self.call("post", "/user", data={
+            "email": "a@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertIn(STICKY_COOKIE, headers["Set-Cookie"])
+
+        self.db.session.add(Recording(owner_email="test@foo.com", url="test"))
+        self.db.session.add(Meeting(host_email="test@foo.com", recording_id=1))
+        self.db.session.commit()
+        self.assertEqual(self.get(self.app, "/meeting"), 200)
+
+        self.app.set_cookie("localhost", STICKY_COOKIE, str(time.time() - 1))
+        meeting_reads.clear()
+        self.assertEqual(self.get(self.app, "/meeting"), 404)
+
+        self.app.application.config["READ_REPLICAS"] = []
+        self.assertEqual(self.get(self.app, "/meeting"), 200)
+
+    def test_writes_go_to_primary(self):
+        pwhash = sha256("secret".encode("utf-8")).hexdigest()
+        self.db.session.add(Recording(
+            owner_email="test@foo.com", url="test", public=False,
+            pwhash=pwhash
+        ))
+        self.db.session.add(Meeting(host_email="test@foo.com", recording_id=1))
+        self.db.session.commit()
+        self.sync()
+
+        # the legacy hash is upgraded on the primary only
+        auth = base64.b64encode(b"test@foo.com:secret").decode("ascii")
+        client = self.app.application.test_client()
+        self.assertEqual(self.get(client, "/view", headers={
+            "Authorization": "Basic {}".format(auth)
+        }), 302)
+
+        self.db.session.remove()
+        recording = Recording.query.get(1)
+        self.assertTrue(recording.pwhash.startswith("pbkdf2_sha256$"))
+        self.assertEqual(
+            self.replica_rows("SELECT pwhash FROM recording"), [(pwhash,)]
+        )
+
+    def test_authorization_reads_primary(self):
+        self.db.session.add(User(email="a@foo.com"))
+        self.db.session.add(Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("pw")
+        ))
+        self.db.session.add(Meeting(host_email="test@foo.com", recording_id=1))
+        self.db.session.add(Viewer(viewer="a@foo.com", recording_id=1))
+        self.db.session.commit()
+        self.sync()
+
+        auth = base64.b64encode(b"a@foo.com:pw").decode("ascii")
+        headers = {"Authorization": "Basic {}".format(auth)}
+        client = self.app.application.test_client()
+        self.assertEqual(self.get(client, "/view", headers=headers), 302)
+
+        # revoked on the primary, the replica still lists the viewer
+        self.db.session.delete(Viewer.query.get(1))
+        self.db.session.commit()
+        self.assertEqual(len(self.replica_rows("SELECT id FROM viewer")), 1)
+        self.assertEqual(self.get(client, "/view", headers=headers), 401)
+
+    def test_token_after_revoke(self):
+        self.db.session.add(User(email="a@foo.com"))
+        self.db.session.add(Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("pw")
+        ))
+        self.db.session.add(Meeting(host_email="test@foo.com", recording_id=1))
+        self.db.session.add(Viewer(viewer="a@foo.com", recording_id=1))
+        self.db.session.commit()
+        self.sync()
+
+        auth = base64.b64encode(b"a@foo.com:pw").decode("ascii")
+        client = self.app.application.test_client()
+        resp = client.post("/view/token", query_string={"meeting_id": 1},
+                           headers={"Authorization": "Basic {}".format(auth)})
+        self.assertEqual(resp.status_code, 200)
+        token = json.loads(resp.data.decode("utf-8"))["token"]
+
+        # revoked on the primary before the replica syncs, no new token
+        # and the old one stops working
+        self.db.session.delete(Viewer.query.get(1))
+        self.db.session.commit()
+        self.assertEqual(len(self.replica_rows("SELECT id FROM viewer")), 1)
+        resp = client.post("/view/token", query_string={"meeting_id": 1},
+                           headers={"Authorization": "Basic {}".format(auth)})
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(self.get(client, "/view", headers={
+            "Authorization": "Bearer {}".format(token)
+        }), 401)
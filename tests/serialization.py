@@ -0,0 +1,49 @@
+import json
+import unittest
+
+from fuze import serialization
+from fuze.serialization import backends, dumps, stdlib_dumps
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class SerializationTests(DatabaseMixin, HelperMixin):
+
+    def tearDown(self):
+        self.app.application.config["JSON_BACKEND"] = None
+        super(SerializationTests, self).tearDown()
+
+    def test_stdlib_compact_bytes(self):
+        body = {"viewers": ["a@foo.com", "é@foo.com"], "next_cursor": None}
+        data = stdlib_dumps(body)
+        self.assertIsInstance(data, bytes)
+        self.assertNotIn(b" ", data)
+        self.assertEqual(json.loads(data.decode("utf-8")), body)
+
+    @unittest.skipIf(serialization.orjson is None, "orjson not installed")
+    def test_backends_agree(self):
+        body = {"results": [{"meeting": {"id": 1, "host": "a@foo.com"}}]}
+        self.assertEqual(
+            json.loads(backends["orjson"](body)),
+            json.loads(stdlib_dumps(body))
+        )
+        self.assertIs(serialization.backend(), backends["orjson"])
+
+    def test_configured_backend(self):
+        self.app.application.config["JSON_BACKEND"] = "json"
+        self.assertIs(serialization.backend(), stdlib_dumps)
+        self.app.application.config["JSON_BACKEND"] = "missing"
+        self.assertIs(serialization.backend(), stdlib_dumps)
+        self.assertEqual(dumps([1]), b"[1]")
+
+    def test_responses(self):
+        for name in backends:
+            self.app.application.config["JSON_BACKEND"] = name
+            resp = self.app.get("/health")
+            self.assertEqual(resp.data, b'{"message":":D"}')
+            self.assertEqual(resp.mimetype, "application/json")
+
+            resp = self.app.get("/meeting", query_string={"meeting_id": 99})
+            self.assertEqual(resp.status_code, 404)
+            self.assertEqual(
+                json.loads(resp.data.decode("utf-8"))["code"], 404
+            )
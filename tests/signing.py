@@ -0,0 +1,35 @@
+import unittest
+
+from fuze.signing import check_secret_key, worker_count
+
+
+class WorkerCountTests(unittest.TestCase):
+
+    def test_servers(self):
+        gunicorn = "/venv/bin/gunicorn"
+        for argv, environ, count in (
+            ([gunicorn, "run:app"], {}, 1),
+            ([gunicorn, "-w", "4", "run:app"], {}, 4),
+            ([gunicorn, "-w4", "run:app"], {}, 4),
+            ([gunicorn, "--workers=3", "run:app"], {}, 3),
+            ([gunicorn, "run:app"], {"GUNICORN_CMD_ARGS": "--workers 2"}, 2),
+            ([gunicorn, "run:app"], {"WEB_CONCURRENCY": "5"}, 5),
+            (["/site-packages/gunicorn/app/wsgiapp.py", "-w", "2"], {}, 2),
+            (["/site-packages/uvicorn/__main__.py", "--workers", "2"], {}, 2),
+        ):
+            self.assertEqual(worker_count(argv, environ), count, argv)
+
+    def test_other_programs(self):
+        self.assertEqual(worker_count(["bench/story.py", "--workers", "4"], {
+            "WEB_CONCURRENCY": "4"
+        }), 1)
+        self.assertEqual(worker_count([], {}), 1)
+
+
+class SecretKeyTests(unittest.TestCase):
+
+    def test_required_with_many_workers(self):
+        check_secret_key({"SECRET_KEY": None}, workers=1)
+        check_secret_key({"SECRET_KEY": "shared"}, workers=4)
+        with self.assertRaises(RuntimeError):
+            check_secret_key({"SECRET_KEY": None}, workers=4)
@@ -0,0 +1,124 @@
+from fuze.models import Meeting, MeetingSummary, Recording, User
+from fuze.summary import main
+from tests.base import DatabaseMixin, HelperMixin
+
+
+class MeetingSummaryTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        super(MeetingSummaryTests, self).setUp()
+        self.app.application.config["MEETING_SUMMARY"] = True
+        for email in ("test@foo.com", "a@foo.com", "b@foo.com"):
+            self.db.session.add(User(email=email))
+        self.db.session.commit()
+
+    def tearDown(self):
+        self.app.application.config["MEETING_SUMMARY"] = False
+        super(MeetingSummaryTests, self).tearDown()
+
+    def listing(self, summary, **qs):
+        self.app.application.config["MEETING_SUMMARY"] = summary
+        try:
+            resp, code, headers = self.call(
+                "get", "/meeting", qs=dict(qs, meeting_id="all")
+            )
+        finally:
+            self.app.application.config["MEETING_SUMMARY"] = True
+        self.assertEqual(code, 200, resp)
+        return resp
+
+    def assertConsistent(self):
+        self.assertEqual(
+            MeetingSummary.check(),
+            {"missing": [], "stale": [], "orphaned": []}
+        )
+        for qs in ({}, {"limit": 1}, {"limit": 1, "after": 1}):
+            self.assertEqual(
+                self.listing(True, **qs), self.listing(False, **qs)
+            )
+
+    def create(self, password="pw"):
+        resp, code, _ = self.call("post", "/meeting", data={
+            "host": "test@foo.com", "password": password
+        })
+        self.assertEqual(code, 200, resp)
+        return resp["meeting_id"]
+
+    def test_maintained_on_writes(self):
+        first = self.create()
+        second = self.create()
+        self.assertConsistent()
+
+        resp, code, _ = self.call("put", "/meeting", data={
+            "meeting_id": first, "email": "a@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+        resp, code, _ = self.call("put", "/meeting/viewers:batch", data={
+            "meeting_id": second, "emails": ["a@foo.com", "b@foo.com"]
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertConsistent()
+
+        resp, code, _ = self.call("put", "/recording", data={
+            "recording_id": 1, "visibility": "private"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertConsistent()
+
+        resp, code, _ = self.call(
+            "get", "/meeting", qs={"meeting_id": second}
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(
+            resp["viewers"], ["a@foo.com", "b@foo.com", "test@foo.com"]
+        )
+
+        resp, code, _ = self.call("delete", "/meeting", data={
+            "meeting_id": first, "password": "pw"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertConsistent()
+        resp, code, _ = self.call("get", "/meeting", qs={"meeting_id": first})
+        self.assertEqual(code, 404, resp)
+
+    def test_listing_is_single_table(self):
+        self.create()
+        self.create()
+        with self.count_queries() as statements:
+            self.listing(True)
+        self.assertEqual(
+            [s for s in statements if "meeting_summary" in s], statements[-1:]
+        )
+        self.assertNotIn("JOIN", statements[-1])
+
+    def test_stream(self):
+        self.create()
+        self.create()
+        self.assertEqual(
+            self.listing(True, stream="true"),
+            self.listing(False, stream="true")
+        )
+
+    def test_rebuild_and_check(self):
+        self.app.application.config["MEETING_SUMMARY"] = False
+        recording = Recording(owner_email="test@foo.com", url="test")
+        self.db.session.add(recording)
+        self.db.session.flush()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(MeetingSummary(
+            meeting_id=99, recording_id=99, document="{}"
+        ))
+        self.db.session.commit()
+
+        self.assertEqual(
+            MeetingSummary.check(),
+            {"missing": [1], "stale": [], "orphaned": [99]}
+        )
+        self.assertEqual(main(["check"]), 1)
+
+        self.assertEqual(main(["rebuild"]), 0)
+        self.app.application.config["MEETING_SUMMARY"] = True
+        self.assertEqual(main(["check"]), 0)
+        self.assertConsistent()
@@ -0,0 +1,58 @@
+import unittest
+
+from jsonschema import Draft4Validator
+from fuze.scheme import mapping
+from fuze.validation import SchemaValidator, validators
+
+
+PAYLOADS = [
+    None, [], "email", 1, {},
+    {"email": "a@foo.com"}, {"email": 1}, {"email": None},
+    {"host": "a@foo.com"}, {"host": "a@foo.com", "password": 1},
+    {"host": "a@foo.com", "password": "secret"},
+    {"meeting_id": 1}, {"meeting_id": -1}, {"meeting_id": 1.5},
+    {"meeting_id": True}, {"meeting_id": "all"}, {"meeting_id": "1"},
+    {"meeting_id": 1, "email": "a@foo.com"}, {"meeting_id": 1, "email": []},
+    {"meeting_id": 1, "password": "secret"},
+    {"recording_id": 1, "visibility": "public"},
+    {"recording_id": 1, "visibility": "hidden"},
+    {"recording_id": -1, "visibility": "private"},
+    {"recording_id": 1, "visibility": "private", "password": 2},
+    {"recording_id": "1", "visibility": "private"},
+    {"emails": []}, {"emails": ["a@foo.com", "b@foo.com"]},
+    {"emails": ["a@foo.com", 1]}, {"emails": "a@foo.com"},
+    {"emails": ["a@foo.com"] * 1001},
+    {"meeting_id": 1, "emails": ["a@foo.com"]},
+    {"meeting_id": -1, "emails": ["a@foo.com"]},
+]
+
+
+class ValidationTests(unittest.TestCase):
+
+    def test_all_schemas_have_fast_path(self):
+        for name, validator in validators.items():
+            self.assertIsNotNone(validator.fast, name)
+
+    def test_matches_jsonschema(self):
+        for name, schema in mapping.items():
+            reference = Draft4Validator(schema)
+            validator = validators[name]
+            for payload in PAYLOADS:
+                self.assertEqual(
+                    validator.fast(payload), reference.is_valid(payload),
+                    (name, payload)
+                )
+                self.assertEqual(
+                    validator.is_valid(payload), reference.is_valid(payload),
+                    (name, payload)
+                )
+
+    def test_unsupported_keywords_use_jsonschema(self):
+        schema = {
+            "type": "object",
+            "properties": {"email": {"type": "string", "maxLength": 3}},
+        }
+        validator = SchemaValidator(schema)
+        self.assertIsNone(validator.fast)
+        self.assertTrue(validator.is_valid({"email": "abc"}))
+        self.assertFalse(validator.is_valid({"email": "abcd"}))
@@ -1,9 +1,80 @@
 import base64
 from hashlib import sha256
+import threading
+import time
+from urllib.parse import parse_qsl, urlparse
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from unittest import mock
+from fuze import errors, models, timing
+from fuze.health import Readiness
+from fuze.passwords import hash_password, pool
+from fuze.cache import authorizations, meeting_reads, view_generations
 from fuze.models import Meeting, Recording, User, Viewer
+from fuze.signing import download_token, download_url, view_token
 from tests.base import DatabaseMixin, HelperMixin
 
 
+class HealthTests(DatabaseMixin, HelperMixin):
+
+    def test_live(self):
+        resp, code, headers = self.call("get", "/health/live")
+        self.assertEqual(code, 200, resp)
+
+    def test_ready(self):
+        self.call("get", "/meeting")
+        resp, code, headers = self.call("get", "/health/ready")
+        self.assertEqual(code, 200, resp)
+        self.assertTrue(resp["database"]["ok"])
+        self.assertFalse(resp["cached"])
+        self.assertIsNotNone(resp["p99_ms"])
+
+        with self.count_queries() as statements:
+            resp, code, headers = self.call("get", "/health/ready")
+        self.assertEqual(code, 200, resp)
+        self.assertTrue(resp["cached"])
+        self.assertEqual(statements, [])
+
+    def test_pool_saturation(self):
+        engine = create_engine(
+            "sqlite://", poolclass=QueuePool, pool_size=2, max_overflow=2
+        )
+        self.addCleanup(engine.dispose)
+        readiness = Readiness()
+        conns = [engine.connect() for _ in range(3)]
+        self.assertEqual(readiness.pool(engine, 2), {
+            "size": 2, "checked_out": 3, "overflow": 1, "saturation": 0.75
+        })
+        for conn in conns:
+            conn.close()
+        self.assertIsNone(readiness.pool(create_engine("sqlite://"), 2))
+
+    def test_not_ready_without_tables(self):
+        self.db.drop_all()
+        resp, code, headers = self.call("get", "/health/ready")
+        self.assertEqual(code, 503, resp)
+        self.assertFalse(resp["ready"])
+        self.assertIn("meeting", resp["database"]["error"])
+
+    def test_probe_timeout(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        class Engine(object):
+            def connect(self):
+                release.wait()
+                raise RuntimeError("released")
+
+        readiness = Readiness()
+        result = readiness.probe_database(Engine(), 0.01)
+        self.assertEqual(
+            result, {"ok": False, "error": "timed out after 0.01s"}
+        )
+
+        result = readiness.probe_database(Engine(), 0.01)
+        self.assertEqual(result["error"], "previous probe still running")
+
+
 class UserTests(DatabaseMixin, HelperMixin):
 
     def setUp(self):
@@ -18,6 +89,48 @@ class UserTests(DatabaseMixin, HelperMixin):
         resp, code, headers = self.call("get", "/health")
         self.assertEqual(code, 200)
 
+    def test_server_timing(self):
+        resp, code, headers = self.call("get", "/health")
+        self.assertIn('db;dur=0.00;desc="0 queries"', headers["Server-Timing"])
+
+        resp, code, headers = self.call(
+            "post", "/user", data={"email": "test2@foo.com"}
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertIn('desc="1 queries"', headers["Server-Timing"])
+
+    def test_server_timing_failed_statement(self):
+        with self.app.application.test_request_context():
+            self.app.application.preprocess_request()
+            with self.assertRaises(Exception):
+                self.db.session.execute("SELECT * FROM missing")
+            self.db.session.rollback()
+            self.db.session.execute("SELECT 1")
+
+            # the failed statement is neither counted nor left behind on
+            # the pooled connection for a later one to pair with
+            self.assertEqual(timing.current().queries, 1)
+            self.assertNotIn(
+                "query_start", self.db.session.connection().info
+            )
+
+    def test_slow_request_log(self):
+        config = self.app.application.config
+        self.addCleanup(
+            config.__setitem__, "SLOW_REQUEST_MS", config["SLOW_REQUEST_MS"]
+        )
+        config["SLOW_REQUEST_MS"] = 0
+
+        with self.assertLogs("fuze.slow", "WARNING") as logs:
+            resp, code, headers = self.call(
+                "post", "/user", data={"email": "test2@foo.com"}
+            )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("POST /user 200", logs.output[0])
+        self.assertIn("1 queries", logs.output[0])
+        self.assertIn("INSERT OR IGNORE INTO user", logs.output[0])
+
     def test_user_create_simple(self):
         data = {"email": "test2@foo.com"}
         resp, code, headers = self.call("post", "/user", data=data)
@@ -38,6 +151,16 @@ class UserTests(DatabaseMixin, HelperMixin):
         ).all()
         self.assertEqual(len(user), 1)
 
+    def test_user_create_single_statement(self):
+        for email, status in (("test2@foo.com", 200), ("test2@foo.com", 409)):
+            with self.count_queries() as statements:
+                resp, code, headers = self.call(
+                    "post", "/user", data={"email": email}
+                )
+            self.assertEqual(code, status, resp)
+            self.assertEqual(len(statements), 1)
+            self.assertTrue(statements[0].startswith("INSERT OR IGNORE"))
+
     def test_user_delete(self):
         data = {"email": "test@foo.com"}
         resp, code, headers = self.call("delete", "/user", data=data)
@@ -48,6 +171,77 @@ class UserTests(DatabaseMixin, HelperMixin):
         ).all()
         self.assertEqual(len(user), 0)
 
+    def test_user_delete_cascades(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        self.db.session.commit()
+        for host in ("test@foo.com", "test2@foo.com"):
+            resp, code, _ = self.call("post", "/meeting", data={"host": host})
+            self.assertEqual(code, 200, resp)
+        resp, code, _ = self.call("put", "/meeting", data={
+            "meeting_id": 2, "email": "test@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+
+        with self.count_queries() as statements:
+            resp, code, _ = self.call(
+                "delete", "/user", data={"email": "test@foo.com"}
+            )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len([s for s in statements if "DELETE" in s]), 1)
+
+        self.assertEqual(self.db.session.query(Meeting.id).all(), [(2,)])
+        self.assertEqual(self.db.session.query(Recording.id).all(), [(2,)])
+        self.assertEqual(
+            self.db.session.query(Viewer.viewer).all(), [("test2@foo.com",)]
+        )
+
+    def test_users_batch_create(self):
+        emails = ["batch{}@foo.com".format(i) for i in range(600)]
+        data = {"emails": ["test@foo.com"] + emails + [emails[0]]}
+        with self.count_queries() as statements:
+            resp, code, headers = self.call("post", "/users:batch", data=data)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp["created"], emails)
+        self.assertEqual(
+            [(c["email"], c["code"], c["error"]) for c in resp["conflicts"]],
+            [
+                ("test@foo.com", 409, "PreexistingUser"),
+                (emails[0], 409, "PreexistingUser"),
+            ]
+        )
+
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.db.session.query(User).count(), 601)
+
+    def test_users_batch_create_race(self):
+        # another request creates test2 between the check and the INSERT,
+        # with RETURNING and row by row on SQLite before 3.35
+        for returning in (True, False):
+            User.query.filter(User.email != "test@foo.com").delete()
+            self.db.session.add(User(email="test2@foo.com"))
+            self.db.session.commit()
+            emails = ["test1@foo.com", "test2@foo.com", "test3@foo.com"]
+            with mock.patch("fuze.models.select_in", return_value=set()), \
+                    mock.patch("fuze.models.RETURNING", returning):
+                resp, code, headers = self.call(
+                    "post", "/users:batch", data={"emails": emails}
+                )
+            self.assertEqual(code, 200, resp)
+            self.assertEqual(
+                resp["created"], ["test1@foo.com", "test3@foo.com"]
+            )
+            self.assertEqual(
+                [(c["email"], c["error"]) for c in resp["conflicts"]],
+                [("test2@foo.com", "PreexistingUser")]
+            )
+            self.assertEqual(self.db.session.query(User).count(), 4)
+
+    def test_users_batch_create_invalid(self):
+        data = {"emails": "test@foo.com"}
+        resp, code, headers = self.call("post", "/users:batch", data=data)
+        self.assertEqual(code, 400, resp)
+
 
 class MeetingTests(DatabaseMixin, HelperMixin):
 
@@ -101,6 +295,29 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         viewers = self.db.session.query(Viewer).all()
         self.assertEqual(len(viewers), 2)
 
+    def test_meeting_create_single_transaction(self):
+        data = {
+            "host": "test@foo.com",
+        }
+        commits = []
+        with mock.patch.object(
+            self.db.session, "commit", side_effect=lambda: commits.append(1)
+        ):
+            resp, code, headers = self.call("post", "/meeting", data=data)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(commits), 1)
+        self.db.session.commit()
+
+        with mock.patch.object(
+            Viewer, "add", side_effect=errors.UserAddToPrivate
+        ):
+            resp, code, headers = self.call("post", "/meeting", data=data)
+        self.assertEqual(code, 401, resp)
+
+        self.assertEqual(self.db.session.query(Meeting).count(), 1)
+        self.assertEqual(self.db.session.query(Recording).count(), 1)
+        self.assertEqual(self.db.session.query(Viewer).count(), 1)
+
     def test_meeting_delete(self):
 
         recording = Recording(owner_email=self.user.email, url="test")
@@ -119,8 +336,10 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         data = {
             "meeting_id": meeting.id
         }
-        resp, code, headers = self.call("delete", "/meeting", data=data)
+        with self.count_queries() as statements:
+            resp, code, headers = self.call("delete", "/meeting", data=data)
         self.assertEqual(code, 200, resp)
+        self.assertEqual(len([s for s in statements if "DELETE" in s]), 1)
 
         meetings = self.db.session.query(Meeting).all()
         recordings = self.db.session.query(Recording).all()
@@ -149,6 +368,98 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         self.assertEqual(code, 200, resp)
         self.assertEqual(len(resp["results"]), 1)
 
+    def add_meetings(self, count, viewers=2):
+        emails = ["viewer{}@foo.com".format(i) for i in range(viewers)]
+        for email in emails:
+            if User.query.get(email) is None:
+                self.db.session.add(User(email=email))
+
+        for i in range(count):
+            recording = Recording(owner_email="test@foo.com", url="test")
+            self.db.session.add(recording)
+            self.db.session.flush()
+            self.db.session.add(Meeting(
+                host_email="test@foo.com", recording_id=recording.id
+            ))
+            for email in emails:
+                self.db.session.add(Viewer(
+                    viewer=email, recording_id=recording.id
+                ))
+        self.db.session.commit()
+        self.db.session.remove()
+
+    def test_meeting_list_query_count(self):
+        qs = {"meeting_id": "all"}
+
+        self.add_meetings(1)
+        with self.count_queries() as few:
+            resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(resp["results"]), 1)
+
+        self.add_meetings(25)
+        with self.count_queries() as many:
+            resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(resp["results"]), 26)
+        self.assertEqual(len(resp["results"][-1]["viewers"]), 2)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_meeting_list_pagination(self):
+        self.add_meetings(5)
+
+        qs = {"meeting_id": "all", "limit": 2}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(
+            [r["meeting"]["id"] for r in resp["results"]], [1, 2]
+        )
+        self.assertEqual(resp["next_cursor"], 2)
+
+        seen = []
+        after = None
+        while True:
+            qs = {"meeting_id": "all", "limit": 2}
+            if after is not None:
+                qs["after"] = after
+            resp, code, headers = self.call("get", "/meeting", qs=qs)
+            self.assertEqual(code, 200, resp)
+            seen.extend(r["meeting"]["id"] for r in resp["results"])
+            after = resp["next_cursor"]
+            if after is None:
+                break
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+
+    def test_meeting_list_pagination_invalid(self):
+        qs = {"meeting_id": "all", "limit": "ten"}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 400, resp)
+
+        qs = {"meeting_id": "all", "limit": 0}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 400, resp)
+
+    def test_meeting_list_stream(self):
+        self.add_meetings(7)
+        config = self.app.application.config
+        self.addCleanup(
+            config.__setitem__, "MEETING_STREAM_BATCH",
+            config["MEETING_STREAM_BATCH"]
+        )
+        config["MEETING_STREAM_BATCH"] = 3
+
+        qs = {"meeting_id": "all", "stream": "true", "after": 1}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(
+            [r["meeting"]["id"] for r in resp["results"]], [2, 3, 4, 5, 6, 7]
+        )
+        self.assertEqual(
+            resp["results"][0]["viewers"],
+            ["viewer0@foo.com", "viewer1@foo.com"]
+        )
+
     def test_meeting_get(self):
 
         recording = Recording(owner_email=self.user.email, url="test")
@@ -169,6 +480,127 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         self.assertEqual(code, 200, resp)
         self.assertEqual(resp["meeting"]["id"], 1)
 
+    def test_meeting_get_etag(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        self.db.session.commit()
+        resp, code, headers = self.call(
+            "post", "/meeting", data={"host": "test@foo.com", "password": "pw"}
+        )
+        self.assertEqual(code, 200, resp)
+
+        qs = {"meeting_id": 1}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        self.assertEqual(code, 200, resp)
+        etag = headers["ETag"]
+
+        with self.count_queries() as statements:
+            cached = self.app.get(
+                "/meeting", query_string=qs, headers={"If-None-Match": etag}
+            )
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["ETag"], etag)
+        self.assertEqual(len(statements), 1)
+
+        resp, code, headers = self.call("get", "/meeting", qs={
+            "meeting_id": "all"
+        })
+        listing = headers["ETag"]
+        cached = self.app.get("/meeting", headers={"If-None-Match": listing})
+        self.assertEqual(cached.status_code, 304)
+
+        resp, code, headers = self.call("put", "/meeting", data={
+            "meeting_id": 1, "email": "test2@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+
+        changed = self.app.get(
+            "/meeting", query_string=qs, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+        changed = self.app.get("/meeting", headers={"If-None-Match": listing})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], listing)
+
+    def test_meeting_get_etag_id_reused(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        self.db.session.commit()
+        resp, code, headers = self.call("post", "/meeting", data={
+            "host": "test2@foo.com", "password": "pw"
+        })
+        self.assertEqual(code, 200, resp)
+        qs = {"meeting_id": 1}
+        resp, code, headers = self.call("get", "/meeting", qs=qs)
+        etag = headers["ETag"]
+
+        # deleting the host deletes its meeting, SQLite reuses the id
+        resp, code, headers = self.call("delete", "/user", data={
+            "email": "test2@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+        resp, code, headers = self.call("post", "/meeting", data={
+            "host": "test@foo.com", "password": "pw"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(Meeting.query.one().id, 1)
+
+        changed = self.app.get(
+            "/meeting", query_string=qs, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    def test_meeting_get_coalesced(self):
+        resp, code, headers = self.call(
+            "post", "/meeting", data={"host": "test@foo.com", "password": "pw"}
+        )
+        self.assertEqual(code, 200, resp)
+        expected, code, headers = self.call(
+            "get", "/meeting", qs={"meeting_id": 1}
+        )
+        meeting_reads.clear()
+
+        # the first fetch is held until the whole herd is waiting on it
+        get, release = Meeting.get, threading.Event()
+
+        def slow_get(*args, **kwargs):
+            release.wait(5)
+            return get(*args, **kwargs)
+
+        responses = []
+
+        def request():
+            resp = self.app.get("/meeting", query_string={"meeting_id": 1})
+            responses.append((resp.status_code, resp.headers["ETag"]))
+
+        herd = [threading.Thread(target=request) for _ in range(20)]
+        with self.count_queries() as statements, \
+                mock.patch.object(Meeting, "get", side_effect=slow_get):
+            for thread in herd:
+                thread.start()
+            while meeting_reads.coalesced < 19:
+                release.wait(0.001)
+            release.set()
+            for thread in herd:
+                thread.join(5)
+
+        self.assertEqual(responses, [(200, headers["ETag"])] * 20)
+        self.assertEqual(
+            meeting_reads.stats(), {"fetches": 1, "coalesced": 19, "hits": 0}
+        )
+        self.assertEqual(len(statements), 2)
+
+        # a write in this worker is visible to the very next read
+        self.db.session.add(User(email="test2@foo.com"))
+        self.db.session.commit()
+        resp, code, _ = self.call("put", "/meeting", data={
+            "meeting_id": 1, "email": "test2@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+        resp, code, _ = self.call("get", "/meeting", qs={"meeting_id": 1})
+        self.assertEqual(resp["viewers"], ["test2@foo.com", "test@foo.com"])
+        self.assertNotEqual(resp, expected)
+
     def test_meeting_delete_dne(self):
 
         recording = Recording(owner_email=self.user.email, url="test")
@@ -227,6 +659,115 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         self.assertEqual(len(recordings), 1)
         self.assertEqual(len(viewers), 2)
 
+    def test_meeting_share_twice(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        recording = Recording(owner_email="test@foo.com", url="test")
+        self.db.session.add(recording)
+        self.db.session.commit()
+
+        meeting = Meeting(host_email="test@foo.com", recording_id=recording.id)
+        self.db.session.add(meeting)
+        self.db.session.commit()
+
+        data = {
+            "meeting_id": meeting.id,
+            "email": "test2@foo.com"
+        }
+        resp, code, headers = self.call("put", "/meeting", data=data)
+        self.assertEqual(code, 200, resp)
+        version = Meeting.version_of(meeting.id)
+
+        with self.count_queries() as statements:
+            resp, code, headers = self.call("put", "/meeting", data=data)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(
+            [s for s in statements if "viewer" in s.split("(")[0]],
+            ["INSERT OR IGNORE INTO viewer (viewer, recording_id) "
+             "VALUES (?, ?)"]
+        )
+        # nothing changed, so the meeting keeps its version and ETag
+        self.assertEqual(Meeting.version_of(meeting.id), version)
+
+        viewers = self.db.session.query(Viewer).all()
+        self.assertEqual(len(viewers), 1)
+
+    def test_meeting_share_batch(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        self.db.session.add(User(email="test3@foo.com"))
+        recording = Recording(owner_email="test@foo.com", url="test")
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(Viewer(
+            viewer="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        data = {
+            "meeting_id": 1,
+            "emails": [
+                "test@foo.com", "test2@foo.com", "nobody@foo.com",
+                "test3@foo.com",
+            ]
+        }
+        resp, code, headers = self.call(
+            "put", "/meeting/viewers:batch", data=data
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp["shared"], ["test2@foo.com", "test3@foo.com"])
+        self.assertEqual(
+            [(c["email"], c["code"]) for c in resp["conflicts"]],
+            [("test@foo.com", 409), ("nobody@foo.com", 404)]
+        )
+
+        viewers = self.db.session.query(Viewer).all()
+        self.assertEqual(len(viewers), 3)
+
+    def test_meeting_share_batch_race(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("pw")
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(Viewer(
+            viewer="test2@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        # another request shares test2 between the check and the INSERT
+        select_in = models.select_in
+
+        def stale(column, values, *criteria):
+            return set() if column is Viewer.viewer \
+                else select_in(column, values, *criteria)
+
+        data = {"meeting_id": 1, "emails": ["test@foo.com", "test2@foo.com"]}
+        with mock.patch("fuze.models.select_in", side_effect=stale):
+            resp, code, headers = self.call(
+                "put", "/meeting/viewers:batch", data=data
+            )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp["shared"], ["test@foo.com"])
+        self.assertEqual(
+            [(c["email"], c["code"]) for c in resp["conflicts"]],
+            [("test2@foo.com", 409)]
+        )
+        self.assertEqual(self.db.session.query(Viewer).count(), 2)
+
+    def test_meeting_share_batch_dne(self):
+        data = {"meeting_id": 100, "emails": ["test@foo.com"]}
+        resp, code, headers = self.call(
+            "put", "/meeting/viewers:batch", data=data
+        )
+        self.assertEqual(code, 404, resp)
+
     def test_meeting_view_with_access(self):
 
         self.user = User(email="test2@foo.com")
@@ -343,8 +884,192 @@ class MeetingTests(DatabaseMixin, HelperMixin):
         self.assertEqual(code, 401)
 
 
+    def test_meeting_view_upgrades_legacy_hash(self):
+        pwhash = sha256("secret".encode("utf-8")).hexdigest()
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True, pwhash=pwhash
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(Viewer(
+            viewer="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        pwb64 = base64.b64encode(
+            "test@foo.com:secret".encode("utf-8")
+        ).decode("ascii")
+        headers = {"Authorization": "Basic {}".format(pwb64)}
+        resp, code, _ = self.call(
+            "get", "/view", headers=headers, qs={"meeting_id": 1}
+        )
+        self.assertEqual(code, 302)
+
+        self.db.session.remove()
+        rec = Recording.query.filter(Recording.id == 1).first()
+        self.assertTrue(rec.pwhash.startswith("pbkdf2_sha256$"))
+
+        # the cached recording lookup was dropped with the upgrade, the
+        # next check sees the new hash and doesn't hash the password again
+        authorizations.clear()
+        with mock.patch("fuze.views.hash_password") as rehash:
+            resp, code, _ = self.call(
+                "get", "/view", headers=headers, qs={"meeting_id": 1}
+            )
+        self.assertEqual(code, 302)
+        self.assertFalse(rehash.called)
+
+    def test_meeting_view_hashing_busy(self):
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("secret")
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(Viewer(
+            viewer="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        pwb64 = base64.b64encode(
+            "test@foo.com:secret".encode("utf-8")
+        ).decode("ascii")
+        auth = {"Authorization": "Basic {}".format(pwb64)}
+
+        # one worker and one queued check fill the pool, the next check is
+        # turned away rather than queued
+        config = self.app.application.config
+        self.addCleanup(pool.configure)
+        self.addCleanup(config.update, dict(config))
+        config.update(PASSWORD_POOL_WORKERS=1, PASSWORD_POOL_QUEUE=1)
+        pool.configure()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        busy = [
+            threading.Thread(target=pool.run, args=(release.wait,))
+            for _ in range(2)
+        ]
+        for thread in busy:
+            thread.start()
+        while pool.slots._value:
+            time.sleep(0.001)
+
+        resp, code, headers = self.call(
+            "get", "/view", headers=auth, qs={"meeting_id": 1}
+        )
+        self.assertEqual(code, 503, resp)
+        self.assertEqual(headers["Retry-After"], "1")
+
+        release.set()
+        for thread in busy:
+            thread.join()
+        resp, code, headers = self.call(
+            "get", "/view", headers=auth, qs={"meeting_id": 1}
+        )
+        self.assertEqual(code, 302, resp)
+
+    def test_meeting_delete_wrong_password(self):
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("secret")
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        data = {"meeting_id": 1, "password": "wrong"}
+        resp, code, headers = self.call("delete", "/meeting", data=data)
+        self.assertEqual(code, 401, resp)
+        self.assertEqual(self.db.session.query(Meeting).count(), 1)
+
+    def test_meeting_view_cached_decisions(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        pwhash = hash_password("secret")
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True, pwhash=pwhash
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        pwb64 = base64.b64encode(
+            "test2@foo.com:secret".encode("utf-8")
+        ).decode("ascii")
+        headers = {"Authorization": "Basic {}".format(pwb64)}
+        qs = {"meeting_id": 1}
+
+        for _ in range(2):
+            resp, code, _ = self.call("get", "/view", headers=headers, qs=qs)
+            self.assertEqual(code, 401)
+        self.assertEqual(authorizations.stats()["hits"], 1)
+
+        data = {"meeting_id": 1, "email": "test2@foo.com"}
+        resp, code, _ = self.call("put", "/meeting", data=data)
+        self.assertEqual(code, 200, resp)
+
+        for _ in range(2):
+            resp, code, _ = self.call("get", "/view", headers=headers, qs=qs)
+            self.assertEqual(code, 302)
+        self.assertEqual(authorizations.stats()["hits"], 2)
+
+        data = {"recording_id": 1, "visibility": "private"}
+        resp, code, _ = self.call("put", "/recording", data=data)
+        self.assertEqual(code, 200, resp)
+
+        resp, code, _ = self.call("get", "/view", headers=headers, qs=qs)
+        self.assertEqual(code, 401)
+
+
 class RecordingTests(DatabaseMixin, HelperMixin):
 
+
+    def test_meeting_view_cached_decision_other_worker(self):
+        self.db.session.add(User(email="test2@foo.com"))
+        recording = Recording(
+            owner_email="test@foo.com", url="test", public=True,
+            pwhash=hash_password("secret")
+        )
+        self.db.session.add(recording)
+        self.db.session.commit()
+        self.db.session.add(Meeting(
+            host_email="test@foo.com", recording_id=recording.id
+        ))
+        self.db.session.add(Viewer(
+            viewer="test2@foo.com", recording_id=recording.id
+        ))
+        self.db.session.commit()
+
+        pwb64 = base64.b64encode(
+            "test2@foo.com:secret".encode("utf-8")
+        ).decode("ascii")
+        headers = {"Authorization": "Basic {}".format(pwb64)}
+        qs = {"meeting_id": 1}
+        resp, code, _ = self.call("get", "/view", headers=headers, qs=qs)
+        self.assertEqual(code, 302)
+
+        # another worker makes the recording private, this one's cache
+        # never hears about it
+        with mock.patch.object(authorizations, "invalidate"):
+            resp, code, _ = self.call("put", "/recording", data={
+                "recording_id": 1, "visibility": "private"
+            })
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(len(authorizations), 1)
+
+        resp, code, _ = self.call("get", "/view", headers=headers, qs=qs)
+        self.assertEqual(code, 401)
     def setUp(self):
         super(RecordingTests, self).setUp()
         self.user = User(email="test@foo.com")
@@ -398,3 +1123,204 @@ class RecordingTests(DatabaseMixin, HelperMixin):
 
         rec = Recording.query.filter(Recording.id == 1).first()
         self.assertTrue(rec.public)
+
+
+class DownloadTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        super(DownloadTests, self).setUp()
+        self.db.session.add(User(email="test@foo.com"))
+        self.db.session.commit()
+        resp, code, _ = self.call(
+            "post", "/meeting", data={"host": "test@foo.com", "password": "pw"}
+        )
+        self.assertEqual(code, 200, resp)
+        self.url = resp["recording_url"]
+        self.token = download_token(self.url)
+
+    def view(self):
+        pwb64 = base64.b64encode(b"test@foo.com:pw").decode("ascii")
+        resp, code, headers = self.call(
+            "get", "/view", qs={"meeting_id": 1},
+            headers={"Authorization": "Basic {}".format(pwb64)}
+        )
+        self.assertEqual(code, 302, resp)
+        location = urlparse(headers["Location"])
+        return location.path, dict(parse_qsl(location.query))
+
+    def test_download_signed_url(self):
+        path, qs = self.view()
+        self.assertEqual(path, "/" + self.url)
+        self.assertEqual(qs["viewer"], "test@foo.com")
+        self.assertEqual(self.view(), (path, qs))
+
+        with self.count_queries() as statements:
+            resp, code, headers = self.call("get", path, qs=qs)
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(statements, [])
+        self.assertEqual(headers["ETag"], '"{}"'.format(self.token))
+        self.assertTrue(
+            headers["Cache-Control"].startswith("public, max-age=")
+        )
+
+        resp = self.app.get(path, query_string=qs, headers={
+            "If-None-Match": headers["ETag"]
+        })
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.data, b"")
+
+    def test_download_rejects_bad_urls(self):
+        path, qs = self.view()
+        for bad in (
+            {},
+            dict(qs, viewer="someone@foo.com"),
+            dict(qs, signature="0" * 64),
+            dict(qs, signature="é"),
+            dict(qs, expires="abc"),
+        ):
+            resp, code, _ = self.call("get", path, qs=bad)
+            self.assertEqual(code, 403, bad)
+
+        resp, code, _ = self.call("get", "/download/other", qs=qs)
+        self.assertEqual(code, 403, resp)
+
+        expired = urlparse(download_url(self.url, "test@foo.com", now=0))
+        resp, code, _ = self.call(
+            "get", expired.path, qs=dict(parse_qsl(expired.query))
+        )
+        self.assertEqual(code, 403, resp)
+
+
+class ViewTokenTests(DatabaseMixin, HelperMixin):
+
+    def setUp(self):
+        super(ViewTokenTests, self).setUp()
+        for email in ("test@foo.com", "viewer@foo.com"):
+            self.db.session.add(User(email=email))
+        self.db.session.commit()
+        resp, code, _ = self.call(
+            "post", "/meeting", data={"host": "test@foo.com", "password": "pw"}
+        )
+        self.assertEqual(code, 200, resp)
+        resp, code, _ = self.call("put", "/meeting", data={
+            "meeting_id": 1, "email": "viewer@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+
+    def basic(self, username, password="pw"):
+        token = "{}:{}".format(username, password).encode("utf-8")
+        return {"Authorization": "Basic " + base64.b64encode(token).decode()}
+
+    def token(self, username="viewer@foo.com", password="pw", meeting_id=1):
+        resp, code, headers = self.call(
+            "post", "/view/token", qs={"meeting_id": meeting_id},
+            headers=self.basic(username, password)
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(resp["token_type"], "Bearer")
+        self.assertEqual(resp["expires_in"], 300)
+        self.assertEqual(headers["Cache-Control"], "no-store")
+        return resp["token"]
+
+    def view(self, token, meeting_id=1):
+        resp, code, headers = self.call(
+            "get", "/view", qs={"meeting_id": meeting_id},
+            headers={"Authorization": "Bearer " + token}
+        )
+        return code, headers.get("Location")
+
+    def test_bearer_view_needs_no_database(self):
+        token = self.token()
+        resp, code, headers = self.call(
+            "get", "/view", qs={"meeting_id": 1},
+            headers=self.basic("viewer@foo.com")
+        )
+        self.assertEqual(code, 302, resp)
+
+        with self.count_queries() as statements:
+            code, location = self.view(token)
+        self.assertEqual(code, 302)
+        self.assertEqual(location, headers["Location"])
+        self.assertEqual(statements, [])
+
+    def test_token_needs_valid_credentials(self):
+        for username, password, meeting_id, status in (
+            ("viewer@foo.com", "wrong", 1, 401),
+            ("nobody@foo.com", "pw", 1, 401),
+            ("viewer@foo.com", "pw", 99, 401),
+            ("viewer@foo.com", "pw", "abc", 400),
+        ):
+            resp, code, _ = self.call(
+                "post", "/view/token", qs={"meeting_id": meeting_id},
+                headers=self.basic(username, password)
+            )
+            self.assertEqual(code, status, (username, meeting_id))
+        resp, code, _ = self.call(
+            "post", "/view/token", qs={"meeting_id": 1}
+        )
+        self.assertEqual(code, 401, resp)
+
+    def test_bad_tokens_rejected(self):
+        token = self.token()
+        payload, signature = token.split(".")
+        generation = view_generations.get(1)
+        other = view_token(1, 1, generation, "viewer@foo.com", "x")[0]
+        for bad in (
+            "", "garbage", payload + "." + "0" * 64, payload + ".é",
+            "!!!." + signature, other.split(".")[0] + "." + signature,
+            view_token(1, 1, generation, "viewer@foo.com", "x", now=0)[0],
+            view_token(1, 1, generation - 1, "viewer@foo.com", "x")[0],
+        ):
+            code, _ = self.view(bad)
+            self.assertEqual(code, 401, bad)
+        self.assertEqual(self.view(other)[0], 302)
+        self.assertEqual(self.view(token, meeting_id=2)[0], 401)
+
+    def test_revoked_by_viewer_and_visibility_changes(self):
+        token = self.token()
+        owner = self.token("test@foo.com")
+
+        self.db.session.add(User(email="other@foo.com"))
+        self.db.session.commit()
+        resp, code, _ = self.call("put", "/meeting", data={
+            "meeting_id": 1, "email": "other@foo.com"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(self.view(token)[0], 401)
+        self.assertEqual(self.view(owner)[0], 401)
+
+        token = self.token()
+        resp, code, _ = self.call("put", "/recording", data={
+            "recording_id": 1, "visibility": "private"
+        })
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(self.view(token)[0], 401)
+        resp, code, _ = self.call(
+            "post", "/view/token", qs={"meeting_id": 1},
+            headers=self.basic("viewer@foo.com")
+        )
+        self.assertEqual(code, 401, resp)
+        self.assertEqual(self.view(self.token("test@foo.com"))[0], 302)
+
+    def test_revoked_when_viewer_deleted(self):
+        token = self.token()
+        generation = view_generations.get(1)
+        resp, code, _ = self.call(
+            "delete", "/user", data={"email": "viewer@foo.com"}
+        )
+        self.assertEqual(code, 200, resp)
+        self.assertEqual(view_generations.get(1), generation + 1)
+        self.assertEqual(self.view(token)[0], 401)
+
+    def test_issued_before_a_change_is_revoked(self):
+        # the viewer is removed while the token is being issued
+        check = Viewer.exists
+
+        def removed(rid, email):
+            allowed = check(rid, email)
+            view_generations.bump([rid])
+            return allowed
+
+        with mock.patch.object(Viewer, "exists", side_effect=removed):
+            token = self.token()
+        self.assertEqual(self.view(token)[0], 401)